@@ -0,0 +1,49 @@
+'''
+Per-request overhead of the access-token dependency with and without the
+verified-JWT cache, for a client that resends the same bearer token.
+
+Run from backend/: ``python -m benchmarks.auth_dependency``
+'''
+
+import asyncio
+import os
+import time
+
+os.environ.setdefault('MONGODB_NAME', 'benchmark')
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-with-32-bytes!')
+
+from starlette.requests import Request  # noqa: E402
+
+from utils.config import settings  # noqa: E402
+from utils.security import access_token_required, authx_security  # noqa: E402
+
+
+def make_request(token: str) -> Request:
+    return Request({
+        'type': 'http',
+        'method': 'GET',
+        'path': '/auth/user',
+        'headers': [(b'authorization', f'Bearer {token}'.encode())],
+        'query_string': b'',
+    })
+
+
+async def measure(requests: int) -> float:
+    token = authx_security.create_access_token('6ad2a86747198d6b17c6f8d2')
+    request = make_request(token)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await access_token_required(request)
+    return (time.perf_counter() - started) / requests
+
+
+async def main(requests: int = 20000) -> None:
+    for enabled in (False, True):
+        settings.JWT_CACHE_ENABLED = enabled
+        seconds = await measure(requests)
+        label = 'cached' if enabled else 'uncached'
+        print(f'{label:>9}: {seconds * 1e6:7.1f} µs/request  {1 / seconds:>9.0f} requests/s')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
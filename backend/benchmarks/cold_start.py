@@ -0,0 +1,133 @@
+'''
+Time to first request: from spawning the server process to its first 200
+from /health/ready, which needs the imports, settings, the lifespan
+warm-up and the first health checks.
+
+Mongo is mongomock-motor (its import is included in the timing) unless
+BENCH_MONGODB_URL points at a real mongod. Each run also records how long
+``import main`` alone takes. Results are JSON keyed by git commit; use
+``--append`` to keep a history file and track the numbers across commits.
+
+Needs ``pip install -r benchmarks/requirements.txt`` without a mongod.
+Run from backend/: ``python -m benchmarks.cold_start --runs 5 --append cold_start.jsonl``
+'''
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.load_test import git_commit
+from tools.import_budget import measure
+
+
+def serve_with_mongomock(port: int) -> None:
+    '''Child process: main:app on mongomock-motor'''
+    from mongomock_motor import AsyncMongoMockClient
+
+    from utils import db
+
+    db.AsyncIOMotorClient = lambda *args, **kwargs: AsyncMongoMockClient()
+
+    import uvicorn
+
+    from main import app
+
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning')
+
+
+def server_command(port: int) -> list[str]:
+    if os.getenv('BENCH_MONGODB_URL'):
+        return [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1',
+                '--port', str(port), '--log-level', 'warning']
+    return [sys.executable, '-m', 'benchmarks.cold_start', '--serve', '--port', str(port)]
+
+
+def server_env() -> dict:
+    env = {
+        'MONGODB_NAME': 'cold_start',
+        'JWT_SECRET_KEY': 'benchmark-secret-key-with-32-bytes!',
+        'MAIL_CONSOLE': 'true',
+        **os.environ,
+    }
+    if os.getenv('BENCH_MONGODB_URL'):
+        env.pop('MODE', None)
+        env['MONGODB_URL'] = os.environ['BENCH_MONGODB_URL']
+    return env
+
+
+def time_to_first_request(port: int, timeout: float) -> float:
+    '''Seconds from spawn to the first 200 from /health/ready'''
+    started = time.perf_counter()
+    server = subprocess.Popen(server_command(port), env=server_env(),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client(base_url=f'http://127.0.0.1:{port}', timeout=1) as client:
+            while time.perf_counter() - started < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError('Server exited during startup')
+                try:
+                    if client.get('/health/ready').status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.005)
+        raise RuntimeError(f'Server was not ready after {timeout}s')
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def spread_ms(samples: list[float]) -> dict:
+    return {
+        'median': round(statistics.median(samples) * 1000, 1),
+        'min': round(min(samples) * 1000, 1),
+        'max': round(max(samples) * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure time to first request')
+    parser.add_argument('--port', type=int, default=8300)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--append', help='append the JSON result as one line to this file')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_with_mongomock(args.port)
+        return
+
+    first_request, import_main = [], []
+    for _ in range(args.runs):
+        rows = measure('main')
+        import_main.append(next(row['cumulative_us'] for row in rows if row['module'] == 'main') / 1e6)
+        first_request.append(time_to_first_request(args.port, args.timeout))
+        print(f'ready after {first_request[-1] * 1000:.0f} ms (import main {import_main[-1] * 1000:.0f} ms)',
+              file=sys.stderr)
+
+    report = {
+        'commit': git_commit(),
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'mongo': 'mongod' if os.getenv('BENCH_MONGODB_URL') else 'mongomock',
+        'runs': args.runs,
+        'time_to_first_request_ms': spread_ms(first_request),
+        'import_main_ms': spread_ms(import_main),
+    }
+    print(json.dumps(report, indent=2))
+    if args.append:
+        with open(args.append, 'a') as file:
+            file.write(json.dumps(report) + '\n')
+
+
+if __name__ == '__main__':
+    main()
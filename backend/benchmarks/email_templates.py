@@ -0,0 +1,40 @@
+'''
+Micro-benchmark for email rendering: per-send file read + str.format +
+EmailMessage versus the compiled template cache with MIME skeletons.
+
+Run from backend/: ``python -m benchmarks.email_templates``
+'''
+
+import os
+import timeit
+
+os.environ.setdefault('MONGODB_NAME', 'benchmark')
+os.environ.setdefault('MAIL_FROM', 'noreply@example.com')
+
+from utils import mail  # noqa: E402
+
+
+URL = 'http://localhost:3000/verify-email/' + 'x' * 180
+RECIPIENT = 'someone@example.com'
+
+
+def render_uncached() -> bytes:
+    template = mail.load_email_template('email_verification.html')
+    html_body = template.format(verification_url=URL)
+    return mail.build_message(RECIPIENT, 'Email Verification', html_body).as_bytes()
+
+
+def render_cached() -> bytes:
+    template = mail.get_email_template('email_verification.html')
+    return template.prepare(RECIPIENT, verification_url=URL).data
+
+
+def main(number: int = 2000) -> None:
+    mail.preload_email_templates()
+    for name, func in (('uncached', render_uncached), ('cached', render_cached)):
+        seconds = min(timeit.repeat(func, number=number, repeat=5))
+        print(f'{name:>9}: {number / seconds:>10.0f} renders/s')
+
+
+if __name__ == '__main__':
+    main()
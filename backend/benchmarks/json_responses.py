@@ -0,0 +1,87 @@
+'''
+JSON encoding cost of the hot responses with FastAPI's default path
+(jsonable_encoder + stdlib json) versus FastJSONResponse (orjson), and
+end-to-end requests per second on one core for the endpoints that can be
+served without a database round trip.
+
+Everything runs in one process on one event loop, so requests/s is a
+per-core figure. /auth/user is served from the warmed user and JWT caches.
+
+Run from backend/: ``python -m benchmarks.json_responses``
+'''
+
+import asyncio
+import os
+import time
+import timeit
+from datetime import datetime, timezone
+
+os.environ.setdefault('MONGODB_NAME', 'benchmark')
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-with-32-bytes!')
+os.environ.setdefault('TESTING', 'true')
+os.environ.setdefault('JWT_CACHE_ENABLED', 'true')
+
+import httpx  # noqa: E402
+from bson import ObjectId  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from main import app  # noqa: E402
+from utils.responses import FastJSONResponse  # noqa: E402
+from utils.security import authx_security  # noqa: E402
+from utils.user_cache import user_cache  # noqa: E402
+
+
+USER_ID = str(ObjectId())
+
+
+def payloads() -> dict:
+    token = authx_security.create_access_token(USER_ID)
+    now = datetime.now(timezone.utc)
+    check = {'status': 'healthy', 'message': 'ok', 'duration_ms': 1.2, 'checked_at': now.isoformat(), 'age_seconds': 0.4}
+    return {
+        'login/refresh': {'access_token': token, 'refresh_token': token},
+        'user': {'id': USER_ID, 'username': 'someone@example.com', 'email_confirmed': now, 'user_type': 'free'},
+        'health/detailed': {
+            'status': 'healthy',
+            'timestamp': now.isoformat(),
+            'checks': {name: dict(check) for name in ('database', 'smtp', 'email_queue', 'user_cache', 'login_throttle')},
+        },
+    }
+
+
+def encoding(number: int) -> None:
+    print('Encoding (µs/response)')
+    for name, payload in payloads().items():
+        default = timeit.timeit(lambda: JSONResponse(jsonable_encoder(payload)), number=number) / number
+        fast = timeit.timeit(lambda: FastJSONResponse(payload), number=number) / number
+        print(f'  {name:>16}: default {default * 1e6:6.1f}  fast {fast * 1e6:6.1f}  ({default / fast:.1f}x)')
+
+
+async def throughput(requests: int) -> None:
+    user_cache.enabled = True
+    user_cache.put({'id': USER_ID, 'username': 'someone@example.com', 'email_confirmed': True, 'user_type': 'free'})
+    headers = {'Authorization': f'Bearer {authx_security.create_access_token(USER_ID)}'}
+
+    # No lifespan: the endpoints below do not touch Mongo once caches are warm
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        print('End to end (one core)')
+        for path, request_headers in (
+            ('/health/live', None),
+            ('/health', None),
+            ('/health/ready', None),
+            ('/health/detailed', None),
+            ('/auth/user', headers),
+        ):
+            await client.get(path, headers=request_headers)
+            started = time.perf_counter()
+            for _ in range(requests):
+                await client.get(path, headers=request_headers)
+            elapsed = time.perf_counter() - started
+            print(f'  {path:>16}: {requests / elapsed:8.0f} requests/s  {elapsed / requests * 1e6:7.1f} µs/request')
+
+
+if __name__ == '__main__':
+    encoding(int(os.getenv('BENCH_ENCODE_ITERATIONS', 20000)))
+    asyncio.run(throughput(int(os.getenv('BENCH_REQUESTS', 3000))))
@@ -0,0 +1,152 @@
+'''
+main:app served by uvicorn against local stand-ins, for benchmarks.load_test.
+
+Mongo is mongomock-motor unless BENCH_MONGODB_URL points at a real mongod,
+and mail goes to an aiosmtpd sink on BENCH_SMTP_PORT. The email worker runs
+in the same process (an in-memory Mongo cannot be shared), and a monitor
+samples event-loop lag. Two benchmark-only routes are added:
+
+- ``POST /_bench/confirm-all`` marks every user's email confirmed
+- ``GET /_bench/stats`` returns and resets loop-lag and SMTP sink counters
+
+Needs ``pip install -r benchmarks/requirements.txt``.
+Run from backend/: ``python -m benchmarks.load_server --port 8100``
+'''
+
+import argparse
+import asyncio
+import os
+import time
+
+mongo_url = os.getenv('BENCH_MONGODB_URL')
+smtp_port = int(os.getenv('BENCH_SMTP_PORT', 8125))
+
+os.environ.setdefault('MONGODB_NAME', 'loadtest')
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-with-32-bytes!')
+# Disables slowapi limits; the login throttle is turned off below
+os.environ.setdefault('TESTING', 'true')
+os.environ.setdefault('LOGIN_THROTTLE_ENABLED', 'false')
+os.environ.setdefault('MAIL_CONSOLE', 'false')
+os.environ.setdefault('MAIL_SERVER', '127.0.0.1')
+os.environ.setdefault('MAIL_PORT', str(smtp_port))
+os.environ.setdefault('MAIL_USE_TLS', 'false')
+os.environ.setdefault('MAIL_USERNAME', 'bench')
+os.environ.setdefault('MAIL_PASSWORD', 'bench')
+os.environ.setdefault('MAIL_FROM', 'bench@example.com')
+os.environ.setdefault('ROOT_URL', 'http://localhost:3000')
+if mongo_url:
+    os.environ.pop('MODE', None)
+    os.environ['MONGODB_URL'] = mongo_url
+
+import uvicorn  # noqa: E402
+from aiosmtpd.controller import Controller  # noqa: E402
+from aiosmtpd.smtp import AuthResult  # noqa: E402
+
+from utils import db  # noqa: E402
+
+if not mongo_url:
+    from mongomock_motor import AsyncMongoMockClient
+
+    def _mock_client(*args, **kwargs):
+        return AsyncMongoMockClient()
+
+    db.AsyncIOMotorClient = _mock_client
+
+from main import app  # noqa: E402
+from utils.config import settings  # noqa: E402
+from workers.runner import EmailWorker  # noqa: E402
+
+
+class SinkHandler:
+    '''Accepts and discards every message'''
+
+    def __init__(self):
+        self.messages = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        return '250 OK'
+
+
+class LoopLagMonitor:
+    '''Measures how late a periodic timer fires; lateness is loop blocking'''
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: list[float] = []
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def drain(self) -> dict:
+        samples, self.samples = sorted(self.samples), []
+        if not samples:
+            return {'samples': 0}
+
+        def at(fraction: float) -> float:
+            return round(samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000, 3)
+
+        return {
+            'samples': len(samples),
+            'p50_ms': at(0.50),
+            'p99_ms': at(0.99),
+            'max_ms': round(samples[-1] * 1000, 3),
+        }
+
+
+sink = SinkHandler()
+lag_monitor = LoopLagMonitor()
+
+
+@app.post('/_bench/confirm-all', include_in_schema=False)
+async def confirm_all():
+    result = await db.get_users_collection().update_many({}, {'$set': {'email_confirmed': True}})
+    return {'confirmed': result.modified_count}
+
+
+@app.get('/_bench/stats', include_in_schema=False)
+async def bench_stats():
+    return {'loop_lag': lag_monitor.drain(), 'smtp_messages': sink.messages}
+
+
+async def serve(port: int) -> None:
+    controller = Controller(
+        sink, hostname='127.0.0.1', port=smtp_port,
+        authenticator=lambda *args: AuthResult(success=True), auth_require_tls=False
+    )
+    controller.start()
+
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    worker = EmailWorker(
+        concurrency=settings.WORKER_CONCURRENCY,
+        lease_seconds=settings.WORKER_LEASE_SECONDS,
+        poll_interval=settings.WORKER_POLL_INTERVAL,
+    )
+    background = [asyncio.create_task(worker.run()), asyncio.create_task(lag_monitor.run())]
+    print(f'✅ Load-test server ready on port {port} ({time.strftime("%H:%M:%S")})', flush=True)
+    try:
+        await serving
+    finally:
+        worker.stop()
+        for task in background:
+            task.cancel()
+        controller.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=8100)
+    args = parser.parse_args()
+    asyncio.run(serve(args.port))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+'''
+Load test of the auth API against local stand-ins (see benchmarks.load_server).
+
+Starts the server in a subprocess, then runs these scenarios in order:
+
+- register_burst: new accounts, each enqueueing a verification email
+- login_storm: concurrent logins of confirmed accounts
+- refresh_churn: every client rotates its refresh token in a loop
+- user_polling: GET /auth/user with a valid access token
+
+For every scenario it reports throughput and p50/p95/p99 latency,
+event-loop lag in the server, and per-dependency time (password hashing,
+db, tasks, mail), taken as the change in the server's /metrics histograms.
+Results are written as JSON (``--output``, default stdout), keyed by git
+commit, so runs can be compared across commits.
+
+Needs ``pip install -r benchmarks/requirements.txt`` and METRICS_ENABLED.
+Run from backend/: ``python -m benchmarks.load_test --concurrency 32 --requests 2000``
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+
+PASSWORD = 'load-test-password'
+OPERATION_LINE = re.compile(
+    r'^operation_duration_seconds_(sum|count)\{component="([^"]+)",operation="([^"]+)"\} (\S+)$'
+)
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float | None:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return round(sorted_values[index] * 1000, 3)
+
+
+async def scrape_operations(client: httpx.AsyncClient) -> dict:
+    '''(component, operation) -> [seconds, calls] from /metrics'''
+    totals = defaultdict(lambda: [0.0, 0])
+    response = await client.get('/metrics')
+    for line in response.text.splitlines():
+        match = OPERATION_LINE.match(line)
+        if match:
+            kind, component, operation, value = match.groups()
+            totals[(component, operation)][0 if kind == 'sum' else 1] = float(value)
+    return totals
+
+
+def dependency_time(before: dict, after: dict) -> dict:
+    components = defaultdict(lambda: {'seconds': 0.0, 'calls': 0})
+    for key, (seconds, calls) in after.items():
+        previous = before.get(key, (0.0, 0))
+        if calls - previous[1] <= 0:
+            continue
+        component = components[key[0]]
+        component['seconds'] = round(component['seconds'] + seconds - previous[0], 6)
+        component['calls'] += int(calls - previous[1])
+    return dict(components)
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, concurrency: int, jobs: list) -> dict:
+    '''Run each job (an async callable returning a response) with bounded concurrency'''
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    queue = list(reversed(jobs))
+
+    async def worker():
+        while queue:
+            job = queue.pop()
+            started = time.perf_counter()
+            try:
+                response = await job()
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    await client.get('/_bench/stats')
+    before = await scrape_operations(client)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    after = await scrape_operations(client)
+    server = (await client.get('/_bench/stats')).json()
+
+    latencies.sort()
+    result = {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'max': percentile(latencies, 1.0),
+        },
+        'status_codes': dict(statuses),
+        'event_loop_lag': server['loop_lag'],
+        'dependency_time': dependency_time(before, after),
+        'smtp_messages_total': server['smtp_messages'],
+    }
+    print(
+        f'{name:>15}: {result["throughput_rps"]:>8} req/s  '
+        f'p50 {result["latency_ms"]["p50"]} ms  p99 {result["latency_ms"]["p99"]} ms  '
+        f'{dict(statuses)}',
+        file=sys.stderr
+    )
+    return result
+
+
+async def run(base_url: str, concurrency: int, requests: int, users: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        run_id = int(time.time())
+        usernames = [f'load{run_id}-{index}@example.com' for index in range(users)]
+        results = {}
+
+        results['register_burst'] = await run_scenario(client, 'register_burst', concurrency, [
+            (lambda username=username: client.post('/auth/register', json={'username': username, 'password': PASSWORD}))
+            for username in usernames
+        ])
+        await client.post('/_bench/confirm-all')
+
+        results['login_storm'] = await run_scenario(client, 'login_storm', concurrency, [
+            (lambda index=index: client.post('/auth/login', json={
+                'username': usernames[index % users], 'password': PASSWORD
+            }))
+            for index in range(requests)
+        ])
+
+        # One token pair per account; each job rotates its account's pair
+        tokens = []
+        for username in usernames:
+            response = await client.post('/auth/login', json={'username': username, 'password': PASSWORD})
+            tokens.append(response.json())
+
+        # Replaying a rotated token revokes the whole account, so rotations of
+        # one account's pair are serialized the way a real client would
+        account_locks = [asyncio.Lock() for _ in range(users)]
+
+        async def refresh(index: int):
+            async with account_locks[index % users]:
+                pair = tokens[index % users]
+                response = await client.post('/auth/refresh', json={'refresh_token': pair['refresh_token']})
+                if response.status_code == 200:
+                    tokens[index % users] = response.json()
+                return response
+
+        results['refresh_churn'] = await run_scenario(client, 'refresh_churn', min(concurrency, users), [
+            (lambda index=index: refresh(index)) for index in range(requests)
+        ])
+
+        results['user_polling'] = await run_scenario(client, 'user_polling', concurrency, [
+            (lambda index=index: client.get('/auth/user', headers={
+                'Authorization': f'Bearer {tokens[index % users]["access_token"]}'
+            }))
+            for index in range(requests)
+        ])
+        return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def wait_until_ready(base_url: str, server: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError('Load-test server exited during startup')
+            try:
+                if (await client.get('/health/live')).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError('Load-test server did not become ready')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Load test the auth API against local stand-ins')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000, help='requests per scenario (register uses --users)')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--output', help='write JSON results here instead of stdout')
+    args = parser.parse_args()
+
+    base_url = f'http://127.0.0.1:{args.port}'
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.load_server', '--port', str(args.port)],
+        env={**os.environ, 'METRICS_ENABLED': 'true'},
+    )
+    try:
+        asyncio.run(wait_until_ready(base_url, server))
+        scenarios = asyncio.run(run(base_url, args.concurrency, args.requests, args.users))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    report = {
+        'commit': git_commit(),
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'mongo': 'mongod' if os.getenv('BENCH_MONGODB_URL') else 'mongomock',
+        'parameters': {'concurrency': args.concurrency, 'requests': args.requests, 'users': args.users},
+        'scenarios': scenarios,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+'''
+Signups per second under contention: check-then-insert versus a single
+insert against the unique username index.
+
+Needs a reachable MongoDB (MONGODB_URL, default mongodb://localhost:27017).
+Writes only to the BENCH_MONGODB_NAME database, which it drops first.
+
+Run from backend/: ``python -m benchmarks.registration_contention``
+'''
+
+import asyncio
+import os
+import random
+import time
+
+os.environ['MONGODB_NAME'] = os.getenv('BENCH_MONGODB_NAME', 'auth_benchmark')
+os.environ.setdefault('MONGODB_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('MONGODB_TEST_URL', os.environ['MONGODB_URL'])
+
+from pymongo.errors import DuplicateKeyError  # noqa: E402
+
+from utils import db  # noqa: E402
+from utils.tasks import build_task_document  # noqa: E402
+
+
+SIGNUPS = int(os.getenv('BENCH_SIGNUPS', 2000))
+CONCURRENCY = int(os.getenv('BENCH_CONCURRENCY', 64))
+# Fraction of signups that reuse an already attempted username
+DUPLICATE_RATIO = float(os.getenv('BENCH_DUPLICATE_RATIO', 0.2))
+FAKE_HASH = '$2b$12$' + 'x' * 53
+
+
+def usernames() -> list[str]:
+    unique = int(SIGNUPS * (1 - DUPLICATE_RATIO)) or 1
+    names = [f'user{i}@example.com' for i in range(unique)]
+    names += random.choices(names, k=SIGNUPS - unique)
+    random.shuffle(names)
+    return names
+
+
+def documents(username: str) -> tuple[dict, dict]:
+    user = {'username': username, 'hashed_password': FAKE_HASH, 'email_confirmed': False}
+    task = build_task_document(username, 'email', {'email_type': 'verification'})
+    return user, task
+
+
+async def check_then_insert(username: str) -> bool:
+    if await db.users_collection.find_one({'username': username}):
+        return False
+    user, task = documents(username)
+    await db.users_collection.insert_one(user)
+    await db.db['processing_tasks'].insert_one(task)
+    return True
+
+
+async def single_insert(username: str) -> bool:
+    user, task = documents(username)
+    try:
+        await db.insert_user_with_task(user, task)
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def run(name: str, signup, names: list[str]) -> None:
+    slots = asyncio.Semaphore(CONCURRENCY)
+    checkouts_before = db.pool_stats.checkouts
+
+    async def one(username: str) -> bool:
+        async with slots:
+            return await signup(username)
+
+    started = time.perf_counter()
+    created = sum(await asyncio.gather(*(one(n) for n in names)))
+    elapsed = time.perf_counter() - started
+
+    stored = await db.users_collection.count_documents({})
+    distinct = len(await db.users_collection.distinct('username'))
+    checkouts = db.pool_stats.checkouts - checkouts_before
+    print(
+        f'{name:>18}: {len(names) / elapsed:8.0f} signups/s  '
+        f'accepted={created}  duplicates_stored={stored - distinct}  '
+        f'round_trips/signup={checkouts / len(names):.2f}'
+    )
+
+
+async def main() -> None:
+    await db.connect_to_mongo()
+    names = usernames()
+
+    # Baseline runs without the unique index, as the old code did
+    await db.client.drop_database(db.db.name)
+    await run('check-then-insert', check_then_insert, names)
+
+    await db.client.drop_database(db.db.name)
+    await db.ensure_indexes()
+    await run(f'single ({db.write_mode})', single_insert, names)
+
+    await db.client.drop_database(db.db.name)
+    await db.close_mongo_connection()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,189 @@
+'''
+Throughput of the production entry point (``python -m serve``) against the
+single uvicorn process that servers.sh starts, on the same route mix:
+
+- 60% GET /auth/user with a valid access token
+- 20% GET /health/ready
+- 10% POST /auth/login
+- 10% POST /auth/refresh (rotations of one account are serialized)
+
+Worker processes do not share memory, so this needs a real mongod
+(BENCH_MONGODB_URL); it only writes to the BENCH_MONGODB_NAME database,
+which it drops before and after. Mail goes to the console. Results are
+printed as JSON keyed by git commit, like benchmarks.load_test.
+
+Run from backend/: ``BENCH_MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.server_throughput --workers 4``
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import httpx
+from pymongo import MongoClient
+
+from benchmarks.load_test import PASSWORD, git_commit, percentile, wait_until_ready
+
+
+MIX = ['user'] * 6 + ['ready'] * 2 + ['login', 'refresh']
+
+
+def server_env(mongo_url: str, database: str) -> dict:
+    env = {
+        **os.environ,
+        'MONGODB_URL': mongo_url,
+        'MONGODB_NAME': database,
+        'JWT_SECRET_KEY': os.getenv('JWT_SECRET_KEY', 'benchmark-secret-key-with-32-bytes!'),
+        # Disables slowapi limits; the login throttle is turned off separately
+        'TESTING': 'true',
+        'LOGIN_THROTTLE_ENABLED': 'false',
+        'MAIL_CONSOLE': 'true',
+        'METRICS_ENABLED': 'false',
+    }
+    env.pop('MODE', None)
+    return env
+
+
+async def seed_users(client: httpx.AsyncClient, usernames: list[str], mongo_url: str, database: str) -> None:
+    for username in usernames:
+        await client.post('/auth/register', json={'username': username, 'password': PASSWORD})
+    with MongoClient(mongo_url) as mongo:
+        mongo[database]['users'].update_many({}, {'$set': {'email_confirmed': True}})
+
+
+async def run_mix(base_url: str, concurrency: int, requests: int, usernames: list[str]) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        tokens = []
+        for username in usernames:
+            response = await client.post('/auth/login', json={'username': username, 'password': PASSWORD})
+            tokens.append(response.json())
+        account_locks = [asyncio.Lock() for _ in usernames]
+
+        async def request(index: int) -> httpx.Response:
+            account = index % len(usernames)
+            kind = MIX[index % len(MIX)]
+            if kind == 'user':
+                return await client.get('/auth/user', headers={
+                    'Authorization': f'Bearer {tokens[account]["access_token"]}'
+                })
+            if kind == 'ready':
+                return await client.get('/health/ready')
+            if kind == 'login':
+                return await client.post('/auth/login', json={'username': usernames[account], 'password': PASSWORD})
+            async with account_locks[account]:
+                response = await client.post('/auth/refresh', json={'refresh_token': tokens[account]['refresh_token']})
+                if response.status_code == 200:
+                    tokens[account] = response.json()
+                return response
+
+        latencies: list[float] = []
+        statuses: Counter = Counter()
+        indexes = list(reversed(range(requests)))
+
+        async def worker():
+            while indexes:
+                index = indexes.pop()
+                started = time.perf_counter()
+                try:
+                    response = await request(index)
+                    statuses[f'{MIX[index % len(MIX)]} {response.status_code}'] += 1
+                except httpx.HTTPError as e:
+                    statuses[f'{MIX[index % len(MIX)]} {type(e).__name__}'] += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'max': percentile(latencies, 1.0),
+        },
+        'status_codes': dict(statuses),
+    }
+
+
+def run_configuration(name: str, command: list[str], env: dict, args, usernames: list[str], seed: bool) -> dict:
+    base_url = f'http://127.0.0.1:{args.port}'
+    server = subprocess.Popen(command, env=env)
+    try:
+        asyncio.run(wait_until_ready(base_url, server, timeout=120))
+        if seed:
+            async def seed_all():
+                async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+                    await seed_users(client, usernames, env['MONGODB_URL'], env['MONGODB_NAME'])
+            asyncio.run(seed_all())
+        result = asyncio.run(run_mix(base_url, args.concurrency, args.requests, usernames))
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+    print(
+        f'{name:>28}: {result["throughput_rps"]:>8} req/s  '
+        f'p50 {result["latency_ms"]["p50"]} ms  p99 {result["latency_ms"]["p99"]} ms',
+        file=sys.stderr
+    )
+    return {'command': ' '.join(command[1:]), **result}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compare python -m serve with a single uvicorn worker')
+    parser.add_argument('--port', type=int, default=8200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=100)
+    args = parser.parse_args()
+
+    mongo_url = os.getenv('BENCH_MONGODB_URL')
+    if not mongo_url:
+        sys.exit('BENCH_MONGODB_URL is required: worker processes cannot share an in-memory Mongo')
+    database = os.getenv('BENCH_MONGODB_NAME', 'auth_benchmark')
+    env = server_env(mongo_url, database)
+    with MongoClient(mongo_url) as mongo:
+        mongo.drop_database(database)
+
+    usernames = [f'throughput-{index}@example.com' for index in range(args.users)]
+    listen = ['--host', '127.0.0.1', '--port', str(args.port)]
+    configurations = {
+        # What servers.sh runs, minus --reload (a file watcher, not a worker)
+        'single_uvicorn_worker': [sys.executable, '-m', 'uvicorn', 'main:app', *listen],
+        f'serve_{args.workers}_workers': [sys.executable, '-m', 'serve', *listen, '--workers', str(args.workers)],
+    }
+    results = {}
+    try:
+        for index, (name, command) in enumerate(configurations.items()):
+            results[name] = run_configuration(name, command, env, args, usernames, seed=index == 0)
+    finally:
+        with MongoClient(mongo_url) as mongo:
+            mongo.drop_database(database)
+
+    print(json.dumps({
+        'commit': git_commit(),
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'parameters': {
+            'workers': args.workers, 'concurrency': args.concurrency,
+            'requests': args.requests, 'users': args.users, 'mix': MIX,
+        },
+        'configurations': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
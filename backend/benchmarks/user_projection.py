@@ -0,0 +1,58 @@
+'''
+Bytes on the wire and BSON decode time per request for full user documents
+versus the per-call-site projections in utils.db, using a large-document
+fixture (a user with a long activity history).
+
+Run from backend/: ``python -m benchmarks.user_projection``
+'''
+
+import os
+import timeit
+from datetime import datetime, timezone
+
+import bson
+
+os.environ.setdefault('MONGODB_NAME', 'benchmark')
+
+from utils.db import (  # noqa: E402
+    UserRecord, LOGIN_FIELDS, PROFILE_FIELDS, STATUS_FIELDS
+)
+
+
+HISTORY_ENTRIES = int(os.getenv('BENCH_HISTORY_ENTRIES', 2000))
+
+
+def large_user() -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        '_id': bson.ObjectId(),
+        'username': 'someone@example.com',
+        'hashed_password': '$2b$12$' + 'x' * 53,
+        'created_at': now,
+        'email_confirmed': now,
+        'user_type': 'free',
+        'history': [
+            {'event': 'login', 'at': now, 'ip': '203.0.113.7', 'agent': 'Mozilla/5.0 ' * 8}
+            for _ in range(HISTORY_ENTRIES)
+        ],
+    }
+
+
+def main(number: int = 200) -> None:
+    document = large_user()
+    full = bson.encode(document)
+    print(f'{"call site":>10} {"bytes":>10} {"decode µs":>10}')
+
+    seconds = min(timeit.repeat(lambda: bson.decode(full), number=number, repeat=5))
+    print(f'{"full":>10} {len(full):>10} {seconds / number * 1e6:>10.1f}')
+
+    for name, fields in (('login', LOGIN_FIELDS), ('profile', PROFILE_FIELDS), ('verify', STATUS_FIELDS)):
+        projected = bson.encode({'_id': document['_id'], **{f: document[f] for f in fields}})
+        seconds = min(timeit.repeat(
+            lambda: UserRecord(bson.decode(projected), fields), number=number, repeat=5
+        ))
+        print(f'{name:>10} {len(projected):>10} {seconds / number * 1e6:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
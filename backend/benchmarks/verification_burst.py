@@ -0,0 +1,97 @@
+'''
+A burst of verification clicks (every link clicked several times at once):
+read-then-write versus the single conditional update in utils.db.
+
+Reports clicks per second, round trips per click, and how many clicks
+were answered "verified" (exactly one per user is correct; the
+read-then-write race lets several through).
+
+Needs a reachable MongoDB 4.2+ (MONGODB_URL, default mongodb://localhost:27017).
+Writes only to the BENCH_MONGODB_NAME database, which it drops first.
+
+Run from backend/: ``python -m benchmarks.verification_burst``
+'''
+
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timezone
+
+os.environ['MONGODB_NAME'] = os.getenv('BENCH_MONGODB_NAME', 'auth_benchmark')
+os.environ.setdefault('MONGODB_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('MONGODB_TEST_URL', os.environ['MONGODB_URL'])
+
+from utils import db  # noqa: E402
+
+
+USERS = int(os.getenv('BENCH_USERS', 500))
+CLICKS_PER_LINK = int(os.getenv('BENCH_CLICKS_PER_LINK', 4))
+CONCURRENCY = int(os.getenv('BENCH_CONCURRENCY', 64))
+
+
+async def read_then_write(username: str) -> str:
+    user = await db.find_user_by_username(username, db.STATUS_FIELDS)
+    if not user:
+        return 'not_found'
+    if user.email_confirmed:
+        return 'already_confirmed'
+    await db.users_collection.update_one(
+        {'username': username},
+        {'$set': {'email_confirmed': datetime.now(timezone.utc)}},
+    )
+    return 'verified'
+
+
+async def conditional_update(username: str) -> str:
+    user = await db.confirm_email(username, datetime.now(timezone.utc))
+    if not user:
+        return 'not_found'
+    return 'already_confirmed' if user.email_confirmed else 'verified'
+
+
+async def seed() -> list[str]:
+    await db.client.drop_database(db.db.name)
+    await db.ensure_indexes()
+    usernames = [f'user{i}@example.com' for i in range(USERS)]
+    await db.users_collection.insert_many([
+        {'username': name, 'hashed_password': '$2b$12$' + 'x' * 53, 'email_confirmed': False}
+        for name in usernames
+    ])
+    clicks = usernames * CLICKS_PER_LINK
+    random.shuffle(clicks)
+    return clicks
+
+
+async def run(name: str, verify) -> None:
+    clicks = await seed()
+    slots = asyncio.Semaphore(CONCURRENCY)
+    checkouts_before = db.pool_stats.checkouts
+
+    async def one(username: str) -> str:
+        async with slots:
+            return await verify(username)
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(one(username) for username in clicks))
+    elapsed = time.perf_counter() - started
+
+    checkouts = db.pool_stats.checkouts - checkouts_before
+    verified = outcomes.count('verified')
+    print(
+        f'{name:>18}: {len(clicks) / elapsed:8.0f} clicks/s  '
+        f'round_trips/click={checkouts / len(clicks):.2f}  '
+        f'verified={verified} (expected {USERS})  already_confirmed={outcomes.count("already_confirmed")}'
+    )
+
+
+async def main() -> None:
+    await db.connect_to_mongo()
+    await run('read-then-write', read_then_write)
+    await run('conditional update', conditional_update)
+    await db.client.drop_database(db.db.name)
+    await db.close_mongo_connection()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
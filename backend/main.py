@@ -1,3 +1,4 @@
+import time
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
@@ -8,25 +9,66 @@ from routers.auth import router as auth_router
 from routers.mail import router as mail_router
 from routers.health import router as health_router
 from routers.user import router as user_router
+from routers.metrics import router as metrics_router
+from routers.tasks import router as tasks_router
+from utils import db
 from utils.db import connect_to_mongo, close_mongo_connection
 from utils.exceptions import register_exception_handlers
+from utils.health_monitor import health_monitor
+from utils.mail import smtp_pool, preload_email_templates
+from utils.metrics import MetricsMiddleware
 from utils.config import settings
 from utils.rate_limit import limiter, rate_limit_exceeded_handler
+from utils.responses import FastJSONResponse
+from utils.revocation import revocation_store
+from utils.security import password_hasher, configure_password_hashing
+from utils.task_events import task_event_hub
+from utils.tasks import task_status_writer
+from utils.user_cache import user_cache
+
+
+async def warm_up():
+    '''Pay connection, hashing and first-check costs before the first request'''
+    started = time.perf_counter()
+    connections = await db.warm_pool(settings.MONGODB_WARM_CONNECTIONS)
+    await password_hasher.warm_up()
+    # /health/ready answers from these results as soon as the worker serves
+    await health_monitor.refresh()
+    print(
+        f'✅ Warm-up finished in {(time.perf_counter() - started) * 1000:.0f} ms '
+        f'({connections} Mongo connections, {password_hasher.workers} hash workers)'
+    )
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await connect_to_mongo()
+    await configure_password_hashing()
+    preload_email_templates()
+    await warm_up()
+    revocation_store.start()
+    health_monitor.start()
+    task_event_hub.start(change_stream=settings.TASK_EVENTS_CHANGE_STREAM)
+    if settings.USER_CACHE_CHANGE_STREAM:
+        user_cache.start_change_stream(db.get_users_collection())
     yield
     # Shutdown
+    await user_cache.stop_change_stream()
+    await revocation_store.stop()
+    await health_monitor.stop()
+    await task_event_hub.stop()
+    password_hasher.shutdown()
+    await smtp_pool.close()
+    await task_status_writer.close()
     await close_mongo_connection()
 
 
 app = FastAPI(
     title='Authentication API',
     version='1.0.0',
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # Add rate limiter state
@@ -45,6 +87,11 @@ app.include_router(auth_router, prefix='/auth')
 app.include_router(mail_router, prefix='/mail')
 app.include_router(health_router)
 app.include_router(user_router, prefix='/user')
+app.include_router(tasks_router, prefix='/tasks')
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
 
 register_exception_handlers(app)
 app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
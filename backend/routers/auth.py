@@ -1,24 +1,34 @@
-import asyncio
 from datetime import datetime, timezone
 
 from authx import RequestToken
 from bson import ObjectId
 from fastapi import APIRouter, HTTPException, Depends, Request
 from jose import jwt
+from pymongo.errors import DuplicateKeyError
+from slowapi.util import get_remote_address
 
 from models.models import (
     UserCreate, Token, RefreshRequest, RegisterResponse,
     PasswordResetRequest, PasswordResetConfirm, UserType
 )
 from utils.config import settings
-from utils.db import get_users_collection, get_user_by_username, get_user_by_id
+from utils.db import (
+    get_users_collection, find_user_by_username, find_user_by_id, get_user_profile,
+    insert_user_with_task, replace_password_hash, reset_password_hash,
+    LOGIN_FIELDS, PASSWORD_FIELDS, STATUS_FIELDS
+)
+from utils.exceptions import HasherSaturatedError
 from utils.security import (
-    hash_password, verify_password, create_confirmation_token,
-    create_password_reset_token, authx_security
+    hash_password_async, verify_password_async, create_confirmation_token,
+    create_password_reset_token, authx_security, access_token_required,
+    create_token_pair, needs_rehash, password_hasher
 )
-from utils.tasks import create_task_record, get_task_by_id
-from workers.email_processor import process_email_task
+from utils.tasks import build_task_document, create_task_record
+from utils.login_throttle import login_throttle
+from utils.revocation import revocation_store
 from utils.rate_limit import limiter, RateLimits
+from utils.responses import FastJSONResponse
+from utils.user_cache import user_cache
 
 
 router = APIRouter()
@@ -27,53 +37,71 @@ router = APIRouter()
 @router.post('/register', response_model=RegisterResponse)
 @limiter.limit(RateLimits.REGISTER)
 async def register(request: Request, user: UserCreate):
-    if await get_user_by_username(user.username):
-        raise HTTPException(status_code=400, detail='User already exists')
-
-    hashed = hash_password(user.password)
-    await get_users_collection().insert_one({
+    # One insert against the unique username index replaces check-then-insert
+    hashed = await hash_password_async(user.password)
+    user_document = {
         'username': user.username,
         'hashed_password': hashed,
         'created_at': datetime.now(timezone.utc),
         'email_confirmed': False,
         'user_type': UserType.free.value
-    })
+    }
 
     confirm_token = create_confirmation_token(user.username)
     verify_url = f'{settings.ROOT_URL}/verify-email/{confirm_token}'
 
-    # Create email task for background processing
+    # Enqueue email task for the worker process
     email_data = {
         'email_type': 'verification',
         'email_address': user.username,
         'token': confirm_token
     }
-    
-    task_id = await create_task_record(
+    task_document = build_task_document(
         user_id=user.username,  # Use username as user_id for registration
         task_type='email',
         email_data=email_data
     )
-    
-    # Start background email processing
-    asyncio.create_task(process_email_task(task_id, email_data))
 
-    return {'confirm_url': verify_url, 'email_task_id': task_id}
+    try:
+        await insert_user_with_task(user_document, task_document)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail='User already exists')
+
+    return {'confirm_url': verify_url, 'email_task_id': task_document['_id']}
 
 @router.post('/login', response_model=Token)
 @limiter.limit(RateLimits.LOGIN)
 async def login(request: Request, user: UserCreate):
-    db_user = await get_user_by_username(user.username)
+    client_ip = get_remote_address(request)
+    retry_after = login_throttle.check(user.username, client_ip)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail='Too many failed login attempts',
+            headers={'Retry-After': str(retry_after)}
+        )
 
-    if not db_user or not verify_password(user.password, db_user['hashed_password']):
+    db_user = await find_user_by_username(user.username, LOGIN_FIELDS)
+
+    if not db_user or not await verify_password_async(user.password, db_user.hashed_password):
+        login_throttle.record_failure(user.username, client_ip)
         raise HTTPException(status_code=401, detail='Invalid credentials')
     
-    if not db_user.get('email_confirmed'):
+    login_throttle.record_success(user.username, client_ip)
+    
+    if not db_user.email_confirmed:
         raise HTTPException(status_code=403, detail='Email not confirmed')
 
-    access = authx_security.create_access_token(str(db_user['_id']))
-    refresh = authx_security.create_refresh_token(str(db_user['_id']))
-    return {'access_token': access, 'refresh_token': refresh}
+    if settings.HASH_REHASH_ON_LOGIN and needs_rehash(db_user.hashed_password):
+        old_hash = db_user.hashed_password
+        password_hasher.rehash_in_background(
+            user.password, old_hash,
+            lambda new_hash: replace_password_hash(db_user.id, old_hash, new_hash)
+        )
+
+    access, refresh = create_token_pair(db_user.id)
+    # Shape matches Token by construction; skip response_model validation
+    return FastJSONResponse({'access_token': access, 'refresh_token': refresh})
 
 
 @router.post('/refresh', response_model=Token)
@@ -85,26 +113,31 @@ async def refresh_token(request: Request, request_data: RefreshRequest):
     except Exception:
         raise HTTPException(status_code=401, detail='Invalid refresh token')
 
-    access = authx_security.create_access_token(payload.sub)
-    refresh = authx_security.create_refresh_token(payload.sub)
-    return {'access_token': access, 'refresh_token': refresh}
+    # Rotate: each refresh token can be exchanged exactly once. Consume even
+    # revoked tokens so a replayed one still trips reuse detection.
+    revoked = revocation_store.is_revoked(payload)
+    if not await revocation_store.consume(payload) or revoked:
+        raise HTTPException(status_code=401, detail='Invalid refresh token')
+
+    access, refresh = create_token_pair(payload.sub)
+    return FastJSONResponse({'access_token': access, 'refresh_token': refresh})
 
 
 @router.post('/request-password-reset')
 @limiter.limit(RateLimits.PASSWORD_RESET)
 async def request_password_reset(request: Request, request_data: PasswordResetRequest):
-    user = await get_user_by_username(request_data.username)
+    user = await find_user_by_username(request_data.username, STATUS_FIELDS)
     
     if not user:
         # Don't reveal if user exists for security reasons
         return {'message': 'If the email exists, a password reset link has been sent'}
     
-    if not user.get('email_confirmed'):
+    if not user.email_confirmed:
         raise HTTPException(status_code=400, detail='Email not confirmed. Please verify your email first.')
     
     reset_token = create_password_reset_token(request_data.username)
     
-    # Create email task for background processing
+    # Enqueue email task for the worker process
     email_data = {
         'email_type': 'password_reset',
         'email_address': request_data.username,
@@ -112,14 +145,11 @@ async def request_password_reset(request: Request, request_data: PasswordResetRe
     }
     
     task_id = await create_task_record(
-        user_id=str(user['_id']),  # Use actual user ID for password reset
+        user_id=user.id,  # Use actual user ID for password reset
         task_type='email',
         email_data=email_data
     )
     
-    # Start background email processing
-    asyncio.create_task(process_email_task(task_id, email_data))
-    
     return {'message': 'If the email exists, a password reset link has been sent', 'email_task_id': task_id}
 
 
@@ -133,39 +163,33 @@ async def reset_password(request: Request, request_data: PasswordResetConfirm):
     except Exception:
         raise HTTPException(status_code=400, detail='Invalid or expired token')
     
-    user = await get_user_by_username(payload['sub'])
+    hashed_password = await hash_password_async(request_data.new_password)
+    
+    # The pre-update state tells "reset" from "unconfirmed" and "no such user"
+    user = await reset_password_hash(payload['sub'], hashed_password, datetime.now(timezone.utc))
     if not user:
         raise HTTPException(status_code=404, detail='User not found')
     
-    if not user.get('email_confirmed'):
+    if not user.email_confirmed:
         raise HTTPException(status_code=400, detail='Email not confirmed')
     
-    hashed_password = hash_password(request_data.new_password)
-    
-    await get_users_collection().update_one(
-        {'username': payload['sub']},
-        {'$set': {'hashed_password': hashed_password, 'password_reset_at': datetime.now(timezone.utc)}}
-    )
+    user_cache.invalidate(username=payload['sub'])
+    await revocation_store.revoke_user(user.id)
     
     return {'message': 'Password reset successfully'}
 
 
 @router.get('/user')
-async def get_user(user_data=Depends(authx_security.access_token_required)):
+async def get_user(user_data=Depends(access_token_required)):
     '''Get current user information'''
     try:
-        # Get user from database using the user ID from JWT token
-        user = await get_user_by_id(user_data.sub)
+        # Get user using the user ID from JWT token (read-through cache)
+        user = await get_user_profile(user_data.sub)
         
         if not user:
             raise HTTPException(status_code=404, detail='User not found')
         
-        return {
-            'id': str(user['_id']),
-            'username': user['username'],
-            'email_confirmed': user.get('email_confirmed', False),
-            'user_type': user.get('user_type', 'free')
-        }
+        return FastJSONResponse(user)
     except Exception as e:
         raise HTTPException(status_code=500, detail='Failed to retrieve user information')
 
@@ -175,7 +199,7 @@ async def get_user(user_data=Depends(authx_security.access_token_required)):
 async def change_password(
     request: Request,
     data: dict,
-    user_data=Depends(authx_security.access_token_required)
+    user_data=Depends(access_token_required)
 ):
     '''Change user password'''
     try:
@@ -187,27 +211,29 @@ async def change_password(
             raise HTTPException(status_code=400, detail='Current password and new password are required')
         
         # Get user from database to verify current password
-        user = await get_users_collection().find_one({'_id': ObjectId(user_data.sub)})
+        user = await find_user_by_id(user_data.sub, PASSWORD_FIELDS)
         
         if not user:
             raise HTTPException(status_code=404, detail='User not found')
         
         # Verify current password
-        if not verify_password(current_password, user['hashed_password']):
+        if not await verify_password_async(current_password, user.hashed_password):
             raise HTTPException(status_code=401, detail='Current password is incorrect')
         
         # Hash new password
-        hashed_password = hash_password(new_password)
+        hashed_password = await hash_password_async(new_password)
         
         # Update password in database
         await get_users_collection().update_one(
             {'_id': ObjectId(user_data.sub)},
             {'$set': {'hashed_password': hashed_password}}
         )
+        user_cache.invalidate(user_id=user_data.sub)
+        await revocation_store.revoke_user(user_data.sub)
         
         return {'message': 'Password changed successfully'}
         
-    except HTTPException:
+    except (HTTPException, HasherSaturatedError):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail='Failed to change password')
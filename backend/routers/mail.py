@@ -1,4 +1,3 @@
-import asyncio
 from datetime import datetime, timezone
 
 from fastapi import APIRouter, HTTPException, Request
@@ -6,12 +5,12 @@ from jose import jwt
 
 from models.models import ResendEmailRequest
 from utils.config import settings
-from utils.db import get_users_collection, get_user_by_username
+from utils.db import find_user_by_username, confirm_email, STATUS_FIELDS
 from utils.mail import send_verification_email
 from utils.security import authx_security, create_confirmation_token
 from utils.tasks import create_task_record
-from workers.email_processor import process_email_task
 from utils.rate_limit import limiter, RateLimits
+from utils.user_cache import user_cache
 
 
 router = APIRouter()
@@ -20,18 +19,18 @@ router = APIRouter()
 @router.post('/resend-confirmation')
 @limiter.limit(RateLimits.RESEND_EMAIL)
 async def resend_confirmation_email(request: Request, data: ResendEmailRequest):
-    user = await get_user_by_username(data.username)
+    user = await find_user_by_username(data.username, STATUS_FIELDS)
 
     if not user:
         raise HTTPException(status_code=404, detail='User not found')
 
-    if user.get('email_confirmed'):
+    if user.email_confirmed:
         raise HTTPException(status_code=400, detail='Email already confirmed')
 
     confirm_token = create_confirmation_token(data.username)
     verify_url = f'{settings.ROOT_URL}/mail/verify/{confirm_token}'
     
-    # Create email task for background processing
+    # Enqueue email task for the worker process
     email_data = {
         'email_type': 'verification',
         'email_address': data.username,
@@ -39,14 +38,11 @@ async def resend_confirmation_email(request: Request, data: ResendEmailRequest):
     }
     
     task_id = await create_task_record(
-        user_id=str(user['_id']),  # Use actual user ID for resend
+        user_id=user.id,  # Use actual user ID for resend
         task_type='email',
         email_data=email_data
     )
     
-    # Start background email processing
-    asyncio.create_task(process_email_task(task_id, email_data))
-    
     return {'confirm_url': verify_url, 'email_task_id': task_id}
 
 
@@ -60,15 +56,13 @@ async def verify_email(request: Request, token: str):
     except Exception:
         raise HTTPException(status_code=400, detail='Invalid token')
 
-    user = await get_user_by_username(payload['sub'])
+    # One conditional update; the pre-update state tells the outcomes apart
+    user = await confirm_email(payload['sub'], datetime.now(timezone.utc))
     if not user:
         raise HTTPException(status_code=404, detail='User not found')
 
-    if user.get('email_confirmed'):
+    if user.email_confirmed:
         return {'message': 'Email already confirmed'}
 
-    await get_users_collection().update_one(
-        {'username': payload['sub']},
-        {'$set': {'email_confirmed': datetime.now(timezone.utc)}},
-    )
+    user_cache.invalidate(username=payload['sub'])
     return {'message': 'Email verified successfully'}
@@ -0,0 +1,36 @@
+import asyncio
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from utils import db
+from utils.metrics import metrics, tasks_by_status
+from utils.tasks import TASK_STATUSES
+
+router = APIRouter(tags=["metrics"])
+
+
+async def collect_task_counts():
+    '''
+    Refresh the processing_tasks gauge with one count per known status; each
+    is a count scan on the status-prefixed indexes, where a $group over
+    status would read every document
+    '''
+    collection = db.get_database()['processing_tasks']
+    try:
+        counts = await asyncio.gather(*(
+            collection.count_documents({'status': status}, maxTimeMS=1000) for status in TASK_STATUSES
+        ))
+    except Exception as e:
+        print(f'❌ Task count collection failed: {e}')
+        return
+    tasks_by_status.clear()
+    for status, count in zip(TASK_STATUSES, counts):
+        tasks_by_status.set((status,), count)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition of request and hot-path metrics"""
+    await collect_task_counts()
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
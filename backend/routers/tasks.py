@@ -0,0 +1,102 @@
+import time
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from utils.config import settings
+from utils.rate_limit import RateLimits, limiter
+from utils.responses import dumps
+from utils.task_events import TooManyWaiters, as_utc, task_event_hub
+from utils.tasks import TERMINAL_STATUSES, get_task_by_id
+
+router = APIRouter(tags=["tasks"])
+
+# SSE comment sent while nothing changes, so proxies keep the stream open
+SSE_KEEPALIVE_SECONDS = 15
+
+
+async def _subscribe_and_read(task_id: str):
+    '''Subscribe first, then read once; later changes come from the hub'''
+    try:
+        waiter = task_event_hub.subscribe(task_id)
+    except TooManyWaiters:
+        raise HTTPException(status_code=503, detail='Too many waiting clients', headers={'Retry-After': '1'})
+    try:
+        task = await get_task_by_id(task_id)
+    except Exception:
+        task_event_hub.unsubscribe(task_id, waiter)
+        raise
+    if not task:
+        task_event_hub.unsubscribe(task_id, waiter)
+        raise HTTPException(status_code=404, detail='Task not found')
+    return waiter, task_event_hub.seed(task_id, task)
+
+
+def _is_newer(snapshot: dict, since: datetime | None) -> bool:
+    updated_at = as_utc(snapshot.get('updated_at'))
+    return since is None or updated_at is None or updated_at > as_utc(since)
+
+
+@router.get('/{task_id}')
+@limiter.limit(RateLimits.TASK_STATUS)
+async def get_task_status(
+    request: Request,
+    task_id: str,
+    wait: float = Query(0, ge=0, description='Seconds to wait for a change (long-poll)'),
+    since: datetime | None = Query(None, description='updated_at from the previous response'),
+):
+    """Task status; with ?wait= the request is held until the task changes or the wait runs out"""
+    waiter, snapshot = await _subscribe_and_read(task_id)
+    deadline = time.monotonic() + min(wait, settings.TASK_WAIT_MAX_SECONDS)
+    try:
+        # Without since, any change ends the wait; with it, only one newer than since
+        while snapshot.get('status') not in TERMINAL_STATUSES and not (since and _is_newer(snapshot, since)):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            changed = await waiter.wait(remaining)
+            if changed is None:
+                break
+            snapshot = changed
+            if since is None:
+                break
+    finally:
+        task_event_hub.unsubscribe(task_id, waiter)
+    return {'task_id': task_id, **snapshot}
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return b'event: ' + event.encode() + b'\ndata: ' + dumps(data) + b'\n\n'
+
+
+@router.get('/{task_id}/events')
+@limiter.limit(RateLimits.TASK_EVENTS)
+async def stream_task_status(request: Request, task_id: str):
+    """Server-sent events: the current status, then every change until the task finishes"""
+    waiter, snapshot = await _subscribe_and_read(task_id)
+
+    async def events():
+        current = snapshot
+        deadline = time.monotonic() + settings.TASK_STREAM_MAX_SECONDS
+        yield _sse('status', {'task_id': task_id, **current})
+        while current.get('status') not in TERMINAL_STATUSES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            changed = await waiter.wait(min(SSE_KEEPALIVE_SECONDS, remaining))
+            if changed is None:
+                yield b': keepalive\n\n'
+                continue
+            current = changed
+            yield _sse('status', {'task_id': task_id, **current})
+        if current.get('status') not in TERMINAL_STATUSES:
+            yield _sse('timeout', {'task_id': task_id})
+
+    # Runs after the stream ends or the client disconnects
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        background=BackgroundTask(task_event_hub.unsubscribe, task_id, waiter),
+    )
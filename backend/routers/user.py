@@ -1,65 +1,67 @@
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import Response
+from fastapi.responses import StreamingResponse
 from datetime import datetime, timezone
 from bson import ObjectId
-from bson.json_util import dumps as bson_dumps
 
-from utils.security import authx_security
+from utils.security import access_token_required
 from utils.db import get_users_collection
+from utils.export import USER_EXCLUDED_FIELDS, stream_user_export, gzip_stream
+from utils.revocation import revocation_store
+from utils.tasks import create_task_record
+from utils.user_cache import user_cache
 
 router = APIRouter(tags=["user"])
 
 
 @router.get('/export-data')
-async def export_user_data(user_data=Depends(authx_security.access_token_required)):
-    """Export all user data in GDPR-compliant JSON format"""
+async def export_user_data(gzip: bool = False, user_data=Depends(access_token_required)):
+    """Export all user data in GDPR-compliant JSON format, streamed in chunks"""
     try:
-        # Query 1: Get user data
-        user = await get_users_collection().find_one({'_id': ObjectId(user_data.sub)})
-        if not user:
-            raise HTTPException(status_code=404, detail='User not found')
-        
-        # Remove sensitive data
-        user.pop('hashed_password', None)
-
-        # Combine data
-        export_data = {
-            'export_info': {
-                'exported_at': datetime.now(timezone.utc),
-                'service': 'Auth export data'
-            },
-            'user': user,
-        }
-        
-        # Convert to JSON with proper BSON handling
-        json_content = bson_dumps(export_data, indent=2, ensure_ascii=False)
-        
-        return Response(
-            content=json_content,
-            media_type='application/json',
-            headers={
-                'Content-Disposition': f'attachment; filename="export-{datetime.now().strftime("%Y%m%d")}.json"'
-            }
-        )
-        
+        # Load the user up front so a missing account is still a clean 404
+        user = await get_users_collection().find_one({'_id': ObjectId(user_data.sub)}, USER_EXCLUDED_FIELDS)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Export failed: {str(e)}')
+    if not user:
+        raise HTTPException(status_code=404, detail='User not found')
+
+    filename = f'export-{datetime.now().strftime("%Y%m%d")}.json'
+    body = stream_user_export(user)
+    if gzip:
+        body = gzip_stream(body)
+        filename += '.gz'
 
+    return StreamingResponse(
+        body,
+        media_type='application/gzip' if gzip else 'application/json',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
 
-@router.delete('/delete-account')
-async def delete_account(user_data=Depends(authx_security.access_token_required)):
-    """Delete user account and all associated data"""
+
+@router.delete('/delete-account', status_code=202)
+async def delete_account(user_data=Depends(access_token_required)):
+    """Mark the account deleted and schedule a background purge of its data"""
     try:
         user_id = ObjectId(user_data.sub)
-        # Delete user account
-        user_result = await get_users_collection().delete_one({'_id': user_id})
-        
-        if user_result.deleted_count == 0:
-            raise HTTPException(status_code=404, detail='User not found')
-        
-        return {
-            'message': 'Account deleted successfully',
-        }
-        
+        # Hides the account from every lookup immediately
+        user_result = await get_users_collection().update_one(
+            {'_id': user_id, 'deleted_at': None},
+            {'$set': {'deleted_at': datetime.now(timezone.utc)}}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Account deletion failed: {str(e)}')
+    if user_result.matched_count == 0:
+        raise HTTPException(status_code=404, detail='User not found')
+
+    try:
+        task_id = await create_task_record(user_id=user_data.sub, task_type='account_purge')
+    except Exception as e:
+        await get_users_collection().update_one({'_id': user_id}, {'$unset': {'deleted_at': ''}})
+        raise HTTPException(status_code=500, detail=f'Account deletion failed: {str(e)}')
+
+    user_cache.invalidate(user_id=user_data.sub)
+    await revocation_store.revoke_user(user_data.sub)
+
+    return {
+        'message': 'Account deletion scheduled',
+        'purge_task_id': task_id,
+    }
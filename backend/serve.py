@@ -0,0 +1,123 @@
+'''
+Production entry point: ``python -m serve`` from backend/.
+
+Runs SERVER_WORKERS uvicorn worker processes sharing one listening socket,
+each on uvloop with the httptools parser when they are installed. Every
+worker runs the app lifespan (Mongo pool, email templates, bcrypt pool,
+first health checks) before it accepts connections. Use ``servers.sh``
+(``uvicorn --reload``) for development.
+'''
+
+import argparse
+import importlib.util
+import os
+import sys
+import tempfile
+from urllib.parse import urlparse
+
+import uvicorn
+
+from utils.config import settings
+
+
+def pick_implementation(preferred: str, module: str) -> str:
+    if importlib.util.find_spec(module) is None:
+        print(f'❌ {module} is not installed, falling back to uvicorn defaults')
+        return 'auto'
+    return preferred
+
+
+def share_rate_limits(workers: int, port: int) -> None:
+    '''
+    Per-process counters would multiply every limit by the worker count,
+    so prefork workers get a file-backed shm:// table unless one is set
+    '''
+    uri = os.getenv('RATE_LIMIT_STORAGE_URI')
+    if uri is None:
+        directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        os.environ['RATE_LIMIT_STORAGE_URI'] = f'shm://{directory}/auth-ratelimit-{port}'
+        return
+    parsed = urlparse(uri)
+    if parsed.scheme == 'memory' or (parsed.scheme == 'shm' and not parsed.path):
+        sys.exit(
+            f'❌ RATE_LIMIT_STORAGE_URI={uri} keeps counters per process, so with {workers} workers '
+            f'every limit would be {workers}x higher; use shm:///dev/shm/<name> or redis://'
+        )
+
+
+def keep_user_cache_coherent(workers: int) -> None:
+    '''
+    Without the change stream, a worker only drops cache entries for writes
+    it made itself; others would serve an unconfirmed or deleted profile
+    for up to USER_CACHE_TTL_SECONDS, so the cache is off by default here
+    '''
+    if settings.USER_CACHE_CHANGE_STREAM:
+        return
+    if os.getenv('USER_CACHE_ENABLED') is None:
+        os.environ['USER_CACHE_ENABLED'] = 'false'
+        print(f'✅ User cache off: {workers} workers and USER_CACHE_CHANGE_STREAM is not enabled')
+    elif settings.USER_CACHE_ENABLED:
+        print(
+            f'⚠️  User cache on without USER_CACHE_CHANGE_STREAM: workers may serve profiles '
+            f'up to {settings.USER_CACHE_TTL_SECONDS:.0f}s out of date'
+        )
+
+
+def calibrate_once() -> None:
+    '''
+    Calibrate the bcrypt cost before forking and hand it to the workers as
+    HASH_ROUNDS, so every worker hashes at the same cost and startup does
+    not run one calibration per worker on contended cores
+    '''
+    if os.getenv('HASH_ROUNDS') or settings.HASH_TIME_BUDGET_MS is None:
+        return
+    from utils.security import calibrate_bcrypt_rounds
+    rounds = calibrate_bcrypt_rounds(settings.HASH_TIME_BUDGET_MS, settings.HASH_MIN_ROUNDS)
+    os.environ['HASH_ROUNDS'] = str(rounds)
+    print(f'✅ bcrypt cost calibrated to {rounds} for a {settings.HASH_TIME_BUDGET_MS:.0f} ms budget')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Run the API with prefork uvicorn workers')
+    parser.add_argument('--host', default=settings.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=settings.SERVER_PORT)
+    parser.add_argument('--workers', type=int, default=settings.SERVER_WORKERS)
+    parser.add_argument('--backlog', type=int, default=settings.SERVER_BACKLOG)
+    parser.add_argument('--keepalive', type=int, default=settings.SERVER_KEEPALIVE_SECONDS)
+    parser.add_argument('--limit-concurrency', type=int, default=settings.SERVER_LIMIT_CONCURRENCY)
+    args = parser.parse_args()
+
+    # Workers inherit the environment; split hashing threads so that N
+    # workers do not each start one per core
+    if args.workers > 1 and not os.getenv('HASH_WORKERS'):
+        os.environ['HASH_WORKERS'] = str(max(1, (os.cpu_count() or 1) // args.workers))
+    if args.workers > 1:
+        share_rate_limits(args.workers, args.port)
+        keep_user_cache_coherent(args.workers)
+        calibrate_once()
+
+    loop = pick_implementation('uvloop', 'uvloop')
+    http = pick_implementation('httptools', 'httptools')
+    print(
+        f'✅ Serving on {args.host}:{args.port} with {args.workers} workers '
+        f'(loop={loop}, http={http}, backlog={args.backlog}, keepalive={args.keepalive}s, '
+        f'limit_concurrency={args.limit_concurrency or "none"}, '
+        f'rate limits in {os.getenv("RATE_LIMIT_STORAGE_URI", settings.RATE_LIMIT_STORAGE_URI)})'
+    )
+    uvicorn.run(
+        'main:app',
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=loop,
+        http=http,
+        backlog=args.backlog,
+        timeout_keep_alive=args.keepalive,
+        limit_concurrency=args.limit_concurrency,
+        access_log=False,
+        proxy_headers=True,
+    )
+
+
+if __name__ == '__main__':
+    main()
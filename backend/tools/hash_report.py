@@ -0,0 +1,99 @@
+'''
+Report how password hashes in the users collection are distributed over
+bcrypt costs, with the verify time and per-core login throughput each
+cost implies on this host.
+
+Run from backend/: ``python -m tools.hash_report [--json]``
+'''
+
+import argparse
+import asyncio
+import json
+
+from utils import db
+from utils.config import settings
+from utils.security import (
+    DEFAULT_BCRYPT_ROUNDS, calibrate_bcrypt_rounds, measure_bcrypt, parse_bcrypt_hash
+)
+
+
+async def hash_distribution() -> dict[str, int]:
+    '''Count users by hash prefix ("$2b$12$") with one aggregation'''
+    db.init_database()
+    pipeline = [
+        {'$project': {'prefix': {'$substrCP': [{'$ifNull': ['$hashed_password', '']}, 0, 7]}}},
+        {'$group': {'_id': '$prefix', 'users': {'$sum': 1}}},
+    ]
+    counts = {}
+    async for row in db.get_users_collection().aggregate(pipeline):
+        counts[row['_id'] or 'missing'] = row['users']
+    await db.close_mongo_connection()
+    return counts
+
+
+def build_report(counts: dict[str, int]) -> dict:
+    # Same precedence as configure_password_hashing at app startup
+    if settings.HASH_ROUNDS is not None:
+        target = settings.HASH_ROUNDS
+    elif settings.HASH_TIME_BUDGET_MS is not None:
+        target = calibrate_bcrypt_rounds(settings.HASH_TIME_BUDGET_MS, settings.HASH_MIN_ROUNDS)
+    else:
+        target = DEFAULT_BCRYPT_ROUNDS
+    floor = settings.HASH_MIN_ROUNDS
+    base = measure_bcrypt(floor)
+    total = sum(counts.values())
+
+    rows = []
+    for prefix, users in sorted(counts.items()):
+        parsed = parse_bcrypt_hash(prefix + 'x')
+        row = {'prefix': prefix, 'users': users, 'share': round(users / total, 4) if total else 0}
+        if parsed is not None:
+            ident, rounds = parsed
+            verify_ms = base * 2 ** (rounds - floor) * 1000
+            row.update({
+                'ident': ident,
+                'rounds': rounds,
+                'est_verify_ms': round(verify_ms, 1),
+                'est_logins_per_core_per_s': round(1000 / verify_ms, 1),
+                'rehash_on_login': ident != '2b' or rounds < target,
+            })
+        rows.append(row)
+
+    return {
+        'users': total,
+        'target_rounds': target,
+        'time_budget_ms': settings.HASH_TIME_BUDGET_MS,
+        'measured_ms_at_min_rounds': {str(floor): round(base * 1000, 2)},
+        'distribution': rows,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f'Users: {report["users"]}   target cost: {report["target_rounds"]}   '
+          f'budget: {report["time_budget_ms"] or "-"} ms')
+    print(f'{"hash":<9}{"users":>9}{"share":>8}{"verify ms":>11}{"logins/core/s":>15}  rehash')
+    for row in report['distribution']:
+        if 'rounds' not in row:
+            print(f'{row["prefix"]:<9}{row["users"]:>9}{row["share"]:>8.1%}{"?":>11}{"?":>15}  ?')
+            continue
+        print(
+            f'{row["prefix"]:<9}{row["users"]:>9}{row["share"]:>8.1%}'
+            f'{row["est_verify_ms"]:>11}{row["est_logins_per_core_per_s"]:>15}'
+            f'  {"yes" if row["rehash_on_login"] else "no"}'
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='bcrypt cost distribution across users')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    report = build_report(asyncio.run(hash_distribution()))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
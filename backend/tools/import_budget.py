@@ -0,0 +1,113 @@
+'''
+Report what importing a module costs, from ``python -X importtime``, and
+fail when it exceeds a budget.
+
+Each run is a fresh interpreter; the median of ``--runs`` is reported per
+module (cumulative time, including everything it imported first) and per
+top-level package (self time summed over its modules).
+
+Run from backend/: ``python -m tools.import_budget [main] [--budget-ms 600] [--json]``
+'''
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# Importing main builds Settings; placeholders let the tool run without a .env
+PLACEHOLDER_ENV = {
+    'MONGODB_NAME': 'import_budget',
+    'JWT_SECRET_KEY': 'import-budget-placeholder-secret-32b',
+}
+
+
+def measure(module: str) -> list[dict]:
+    '''One cold import of ``module``; returns importtime rows in import order'''
+    env = {**PLACEHOLDER_ENV, **os.environ}
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, env=env,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f'Importing {module} failed:\n{completed.stderr[-2000:]}')
+    rows = []
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append({
+                'module': name,
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+                'depth': (len(indent) - 1) // 2,
+            })
+    return rows
+
+
+def summarize(runs: list[list[dict]], module: str, top: int) -> dict:
+    cumulative: dict[str, list[int]] = {}
+    packages: dict[str, list[int]] = {}
+    for rows in runs:
+        per_package: dict[str, int] = {}
+        for row in rows:
+            cumulative.setdefault(row['module'], []).append(row['cumulative_us'])
+            package = row['module'].split('.')[0]
+            per_package[package] = per_package.get(package, 0) + row['self_us']
+        for package, total in per_package.items():
+            packages.setdefault(package, []).append(total)
+
+    def ms(values: list[int]) -> float:
+        return round(statistics.median(values) / 1000, 2)
+
+    slowest_modules = sorted(cumulative.items(), key=lambda item: -statistics.median(item[1]))
+    slowest_packages = sorted(packages.items(), key=lambda item: -statistics.median(item[1]))
+    return {
+        'module': module,
+        'runs': len(runs),
+        'total_ms': ms(cumulative[module]),
+        'modules_imported': len(runs[0]),
+        'slowest_modules_ms': {name: ms(values) for name, values in slowest_modules[:top] if name != module},
+        'packages_ms': {name: ms(values) for name, values in slowest_packages[:top]},
+    }
+
+
+def print_report(report: dict, budget_ms: float | None) -> None:
+    budget = f' (budget {budget_ms:.0f} ms)' if budget_ms is not None else ''
+    print(f'import {report["module"]}: {report["total_ms"]} ms, '
+          f'{report["modules_imported"]} modules, median of {report["runs"]} runs{budget}')
+    print(f'\n{"package (self time)":<40}{"ms":>10}')
+    for name, value in report['packages_ms'].items():
+        print(f'{name:<40}{value:>10}')
+    print(f'\n{"module (cumulative)":<40}{"ms":>10}')
+    for name, value in report['slowest_modules_ms'].items():
+        print(f'{name:<40}{value:>10}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Import-time report and budget check')
+    parser.add_argument('module', nargs='?', default='main')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--budget-ms', type=float, help='exit 1 when the median total exceeds this')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    report = summarize([measure(args.module) for _ in range(args.runs)], args.module, args.top)
+    over_budget = args.budget_ms is not None and report['total_ms'] > args.budget_ms
+    if args.json:
+        print(json.dumps({**report, 'budget_ms': args.budget_ms, 'over_budget': over_budget}, indent=2))
+    else:
+        print_report(report, args.budget_ms)
+    if over_budget:
+        print(f'❌ import {args.module} took {report["total_ms"]} ms, over the {args.budget_ms:.0f} ms budget',
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
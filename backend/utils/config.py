@@ -1,41 +1,236 @@
 import os
-from dotenv import load_dotenv
 from urllib.parse import quote_plus
 
 
-load_dotenv()
+TRUE_VALUES = ('true', '1', 'yes', 'on')
+FALSE_VALUES = ('false', '0', 'no', 'off')
+
+
+def _int(name: str, default: int | None = None) -> int | None:
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer, got {raw!r}') from None
+
+
+def _float(name: str, default: float | None = None) -> float | None:
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        raise ValueError(f'{name} must be a number, got {raw!r}') from None
+
+
+def _bool(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    if raw.lower() in TRUE_VALUES:
+        return True
+    if raw.lower() in FALSE_VALUES:
+        return False
+    raise ValueError(f'{name} must be true or false, got {raw!r}')
 
 
 class Settings:
-    if os.getenv('MODE') == 'DEV':
-        MONGODB_URL: str | None = os.getenv('MONGODB_TEST_URL')
-        ROOT_URL: str | None = os.getenv('ROOT_TEST_URL')
-    else:
-        _raw_mongo_url = os.getenv('MONGODB_URL')
-        _password = os.getenv('MONGODB_PASSWORD') or ''
-        _encoded_pwd = quote_plus(_password)
-        if _raw_mongo_url and '<PASSWORD>' in _raw_mongo_url:
-            MONGODB_URL: str | None = _raw_mongo_url.replace('<PASSWORD>', _encoded_pwd)
+    '''
+    Environment configuration, read once when first used.
+
+    Loading .env and parsing happen in __init__ rather than at import, and
+    invalid values fail with the variable name instead of a bare int() error.
+    '''
+
+    def __init__(self):
+        # Imported here so importing config stays free until settings are read
+        from dotenv import load_dotenv
+        load_dotenv()
+
+        if os.getenv('MODE') == 'DEV':
+            self.MONGODB_URL: str | None = os.getenv('MONGODB_TEST_URL')
+            self.ROOT_URL: str | None = os.getenv('ROOT_TEST_URL')
         else:
-            MONGODB_URL: str | None = _raw_mongo_url
-        ROOT_URL: str | None = os.getenv('ROOT_URL')
+            raw_mongo_url = os.getenv('MONGODB_URL')
+            password = os.getenv('MONGODB_PASSWORD') or ''
+            encoded_pwd = quote_plus(password)
+            if raw_mongo_url and '<PASSWORD>' in raw_mongo_url:
+                self.MONGODB_URL: str | None = raw_mongo_url.replace('<PASSWORD>', encoded_pwd)
+            else:
+                self.MONGODB_URL: str | None = raw_mongo_url
+            self.ROOT_URL: str | None = os.getenv('ROOT_URL')
+
+        database_name = os.getenv('MONGODB_NAME')
+        if not database_name:
+            raise ValueError('MONGODB_NAME environment variable is required')
+        self.DATABASE_NAME: str = database_name
+
+        # MongoDB connection pool
+        self.MONGODB_MAX_POOL_SIZE: int = _int('MONGODB_MAX_POOL_SIZE', 100)
+        self.MONGODB_MIN_POOL_SIZE: int = _int('MONGODB_MIN_POOL_SIZE', 0)
+        self.MONGODB_MAX_IDLE_TIME_MS: int | None = _int('MONGODB_MAX_IDLE_TIME_MS')
+        self.MONGODB_WAIT_QUEUE_TIMEOUT_MS: int | None = _int('MONGODB_WAIT_QUEUE_TIMEOUT_MS')
+        # Connections opened at startup, before the process serves its first request
+        self.MONGODB_WARM_CONNECTIONS: int = _int('MONGODB_WARM_CONNECTIONS', 4)
+        # auto, bulk (MongoDB 8.0+), transaction (replica set) or sequential
+        self.MONGODB_MULTI_WRITE_MODE: str = os.getenv('MONGODB_MULTI_WRITE_MODE', 'auto')
+        # Finished processing_tasks are removed by a TTL index after this long
+        self.TASK_RETENTION_SECONDS: int = _int('TASK_RETENTION_SECONDS', 7 * 24 * 3600)
+
+        # Security
+        self.SECRET_KEY: str | None = os.getenv('SECRET_KEY')
+        self.JWT_SECRET_KEY: str | None = os.getenv('JWT_SECRET_KEY')
+        self.JWT_REFRESH_TOKEN_EXPIRES_SECONDS: int = _int('JWT_REFRESH_TOKEN_EXPIRES_SECONDS', 20 * 24 * 3600)
+        # How often each worker pulls revocations made by other workers
+        self.REVOCATION_SYNC_SECONDS: float = _float('REVOCATION_SYNC_SECONDS', 5)
+        # Opt-in cache of verified access-token payloads
+        self.JWT_CACHE_ENABLED: bool = _bool('JWT_CACHE_ENABLED', False)
+        self.JWT_CACHE_MAX_ENTRIES: int = _int('JWT_CACHE_MAX_ENTRIES', 10000)
+
+        # Email
+        self.MAIL_CONSOLE: bool = _bool('MAIL_CONSOLE', False)
+        self.MAIL_USERNAME: str | None = os.getenv('MAIL_USERNAME')
+        self.MAIL_PASSWORD: str | None = os.getenv('MAIL_PASSWORD')
+        self.MAIL_SERVER: str | None = os.getenv('MAIL_SERVER')
+        self.MAIL_FROM: str | None = os.getenv('MAIL_FROM')
+        self.MAIL_PORT: int = _int('MAIL_PORT', 465)
+        # Implicit TLS (port 465); set false only for a local SMTP sink
+        self.MAIL_USE_TLS: bool = _bool('MAIL_USE_TLS', True)
+        self.MAIL_POOL_SIZE: int = _int('MAIL_POOL_SIZE', 2)
+        self.MAIL_MAX_MESSAGES_PER_CONNECTION: int = _int('MAIL_MAX_MESSAGES_PER_CONNECTION', 100)
+        self.MAIL_KEEPALIVE_SECONDS: int = _int('MAIL_KEEPALIVE_SECONDS', 30)
+        # Re-read email templates when their mtime changes (on by default in DEV)
+        self.MAIL_TEMPLATE_RELOAD: bool = _bool('MAIL_TEMPLATE_RELOAD', os.getenv('MODE') == 'DEV')
+
+        # Password hashing pool
+        self.HASH_EXECUTOR: str = os.getenv('HASH_EXECUTOR', 'thread')
+        self.HASH_WORKERS: int = _int('HASH_WORKERS', os.cpu_count() or 1)
+        self.HASH_QUEUE_SIZE: int = _int('HASH_QUEUE_SIZE', 64)
+        self.HASH_RETRY_AFTER: int = _int('HASH_RETRY_AFTER', 1)
+        # bcrypt cost: fixed HASH_ROUNDS, or calibrated at startup to the largest
+        # cost that hashes within HASH_TIME_BUDGET_MS on this host (never below
+        # HASH_MIN_ROUNDS). Neither set keeps passlib's default of 12.
+        self.HASH_ROUNDS: int | None = _int('HASH_ROUNDS')
+        self.HASH_TIME_BUDGET_MS: float | None = _float('HASH_TIME_BUDGET_MS')
+        self.HASH_MIN_ROUNDS: int = _int('HASH_MIN_ROUNDS', 10)
+        # Re-hash weaker hashes after a successful login, off the request path
+        self.HASH_REHASH_ON_LOGIN: bool = _bool('HASH_REHASH_ON_LOGIN', True)
+
+        # Rate limiting: memory://, shm:// (bounded, per process),
+        # shm:///dev/shm/<name> (shared by workers on one host) or redis://host:port
+        self.RATE_LIMIT_STORAGE_URI: str = os.getenv('RATE_LIMIT_STORAGE_URI', 'shm://')
+        self.RATE_LIMIT_STRATEGY: str = os.getenv('RATE_LIMIT_STRATEGY', 'sliding-window-counter')
+        self.RATE_LIMIT_SLOTS: int = _int('RATE_LIMIT_SLOTS', 65536)
+
+        # User profile cache
+        self.USER_CACHE_ENABLED: bool = _bool('USER_CACHE_ENABLED', True)
+        self.USER_CACHE_MAX_ENTRIES: int = _int('USER_CACHE_MAX_ENTRIES', 10000)
+        self.USER_CACHE_TTL_SECONDS: float = _float('USER_CACHE_TTL_SECONDS', 30)
+        self.USER_CACHE_CHANGE_STREAM: bool = _bool('USER_CACHE_CHANGE_STREAM', False)
+
+        # Login throttling (checked before the user lookup and bcrypt)
+        self.LOGIN_THROTTLE_ENABLED: bool = _bool('LOGIN_THROTTLE_ENABLED', True)
+        self.LOGIN_MAX_FAILURES_PER_USER: int = _int('LOGIN_MAX_FAILURES_PER_USER', 5)
+        # Per username across all subnets; catches guessing spread over many networks
+        self.LOGIN_MAX_FAILURES_PER_ACCOUNT: int = _int('LOGIN_MAX_FAILURES_PER_ACCOUNT', 100)
+        self.LOGIN_MAX_FAILURES_PER_SUBNET: int = _int('LOGIN_MAX_FAILURES_PER_SUBNET', 50)
+        self.LOGIN_THROTTLE_WINDOW_SECONDS: int = _int('LOGIN_THROTTLE_WINDOW_SECONDS', 900)
+        self.LOGIN_THROTTLE_MAX_KEYS: int = _int('LOGIN_THROTTLE_MAX_KEYS', 100000)
+
+        # Email worker
+        self.WORKER_CONCURRENCY: int = _int('WORKER_CONCURRENCY', 4)
+        self.WORKER_LEASE_SECONDS: int = _int('WORKER_LEASE_SECONDS', 60)
+        self.WORKER_POLL_INTERVAL: float = _float('WORKER_POLL_INTERVAL', 1.0)
+
+        # Account purge: dependent documents deleted per batch and pause between batches
+        self.PURGE_BATCH_SIZE: int = _int('PURGE_BATCH_SIZE', 500)
+        self.PURGE_BATCH_DELAY_MS: int = _int('PURGE_BATCH_DELAY_MS', 50)
+
+        # Task status write-behind
+        self.TASK_WRITE_BEHIND: bool = _bool('TASK_WRITE_BEHIND', True)
+        self.TASK_FLUSH_INTERVAL_MS: int = _int('TASK_FLUSH_INTERVAL_MS', 200)
+        self.TASK_FLUSH_MAX_BATCH: int = _int('TASK_FLUSH_MAX_BATCH', 100)
+        self.TASK_SYNC_TERMINAL: bool = _bool('TASK_SYNC_TERMINAL', True)
+
+        # Task status long-poll/SSE: waiter bounds and how other workers' updates arrive
+        self.TASK_WAIT_MAX_SECONDS: float = _float('TASK_WAIT_MAX_SECONDS', 30)
+        self.TASK_STREAM_MAX_SECONDS: float = _float('TASK_STREAM_MAX_SECONDS', 300)
+        self.TASK_MAX_WAITERS: int = _int('TASK_MAX_WAITERS', 10000)
+        self.TASK_EVENTS_POLL_INTERVAL: float = _float('TASK_EVENTS_POLL_INTERVAL', 1.0)
+        self.TASK_EVENTS_CHANGE_STREAM: bool = _bool('TASK_EVENTS_CHANGE_STREAM', False)
+
+        # GDPR export: cursor batch size and gzip level for ?gzip=true
+        self.EXPORT_BATCH_SIZE: int = _int('EXPORT_BATCH_SIZE', 100)
+        self.EXPORT_GZIP_LEVEL: int = _int('EXPORT_GZIP_LEVEL', 6)
+
+        # Background dependency checks served by /health/detailed and /health/ready
+        self.HEALTH_CHECK_INTERVAL: float = _float('HEALTH_CHECK_INTERVAL', 10)
+        self.HEALTH_CHECK_TIMEOUT: float = _float('HEALTH_CHECK_TIMEOUT', 2)
+        self.HEALTH_STALE_SECONDS: float = _float('HEALTH_STALE_SECONDS', 30)
+        self.HEALTH_MAX_QUEUE_BACKLOG: int = _int('HEALTH_MAX_QUEUE_BACKLOG', 1000)
+
+        # Production server (python -m serve): prefork workers and uvicorn limits
+        self.SERVER_HOST: str = os.getenv('SERVER_HOST', '0.0.0.0')
+        self.SERVER_PORT: int = _int('SERVER_PORT', 8000)
+        self.SERVER_WORKERS: int = _int('SERVER_WORKERS', os.cpu_count() or 1)
+        self.SERVER_BACKLOG: int = _int('SERVER_BACKLOG', 2048)
+        self.SERVER_KEEPALIVE_SECONDS: int = _int('SERVER_KEEPALIVE_SECONDS', 5)
+        self.SERVER_LIMIT_CONCURRENCY: int | None = _int('SERVER_LIMIT_CONCURRENCY')
+
+        # Prometheus /metrics endpoint and request/hot-path timers
+        self.METRICS_ENABLED: bool = _bool('METRICS_ENABLED', True)
+
+        self.validate()
+
+    def validate(self) -> None:
+        choices = {
+            'HASH_EXECUTOR': ('thread', 'process'),
+            'MONGODB_MULTI_WRITE_MODE': ('auto', 'bulk', 'transaction', 'sequential'),
+        }
+        for name, allowed in choices.items():
+            if getattr(self, name) not in allowed:
+                raise ValueError(f'{name} must be one of {", ".join(allowed)}, got {getattr(self, name)!r}')
+        for name in (
+            'HASH_WORKERS', 'WORKER_CONCURRENCY', 'SERVER_WORKERS',
+            'TASK_MAX_WAITERS', 'EXPORT_BATCH_SIZE', 'PURGE_BATCH_SIZE',
+        ):
+            if getattr(self, name) < 1:
+                raise ValueError(f'{name} must be at least 1, got {getattr(self, name)}')
+        # 0 is pymongo's "no limit"
+        if self.MONGODB_MAX_POOL_SIZE < 0:
+            raise ValueError(f'MONGODB_MAX_POOL_SIZE cannot be negative, got {self.MONGODB_MAX_POOL_SIZE}')
+        if 0 < self.MONGODB_MAX_POOL_SIZE < self.MONGODB_MIN_POOL_SIZE:
+            raise ValueError('MONGODB_MIN_POOL_SIZE cannot exceed MONGODB_MAX_POOL_SIZE')
+        if not 0 <= self.EXPORT_GZIP_LEVEL <= 9:
+            raise ValueError(f'EXPORT_GZIP_LEVEL must be between 0 and 9, got {self.EXPORT_GZIP_LEVEL}')
+
+
+class LazySettings:
+    '''
+    Builds Settings on first attribute access, so tools and tests can import
+    config without an environment.
+
+    This is not lazy for the app: singletons such as the limiter, the SMTP
+    pool and the password hasher read settings when their modules are
+    imported, so ``import main`` builds (and validates) Settings.
+    '''
+
+    def __init__(self):
+        object.__setattr__(self, '_settings', None)
 
-    _database_name = os.getenv('MONGODB_NAME')
-    if not _database_name:
-        raise ValueError('MONGODB_NAME environment variable is required')
-    DATABASE_NAME: str = _database_name
+    def _load(self) -> Settings:
+        if self._settings is None:
+            object.__setattr__(self, '_settings', Settings())
+        return self._settings
 
-    # Security
-    SECRET_KEY: str | None = os.getenv('SECRET_KEY')
-    JWT_SECRET_KEY: str | None = os.getenv('JWT_SECRET_KEY')
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
 
-    # Email
-    MAIL_CONSOLE: bool = os.getenv('MAIL_CONSOLE', 'false').lower() == 'true'
-    MAIL_USERNAME: str | None = os.getenv('MAIL_USERNAME')
-    MAIL_PASSWORD: str | None = os.getenv('MAIL_PASSWORD')
-    MAIL_SERVER: str | None = os.getenv('MAIL_SERVER')
-    MAIL_FROM: str | None = os.getenv('MAIL_FROM')
-    MAIL_PORT: int = int(os.getenv('MAIL_PORT', 465))
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
 
 
-settings = Settings()
+settings = LazySettings()
@@ -1,16 +1,123 @@
+import asyncio
+import time
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, InsertOne, ReturnDocument, monitoring
+from pymongo.errors import ClientBulkWriteException, DuplicateKeyError
 from .config import settings
+from .metrics import timed
+from .user_cache import user_cache
+
+
+# Indexes every query path relies on: (collection, name, keys, options)
+REQUIRED_INDEXES = [
+    ('users', 'username_unique', [('username', ASCENDING)], {'unique': True}),
+    ('processing_tasks', 'status_run_after', [('status', ASCENDING), ('run_after', ASCENDING)], {}),
+    ('processing_tasks', 'status_updated_at', [('status', ASCENDING), ('updated_at', ASCENDING)], {}),
+    # Serves the export's user_id filter and its created_at sort
+    ('processing_tasks', 'user_id_created_at', [('user_id', ASCENDING), ('created_at', ASCENDING)], {}),
+    (
+        'processing_tasks', 'finished_at_ttl', [('finished_at', ASCENDING)],
+        {'expireAfterSeconds': settings.TASK_RETENTION_SECONDS}
+    ),
+    ('revoked_tokens', 'expires_at_ttl', [('expires_at', ASCENDING)], {'expireAfterSeconds': 0}),
+    ('revoked_tokens', 'kind_created_at', [('kind', ASCENDING), ('created_at', ASCENDING)], {}),
+]
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    '''Tracks connection pool usage from driver CMAP events'''
+
+    def __init__(self):
+        self.open_connections = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def stats(self) -> dict:
+        avg_wait = self.total_wait_ms / self.checkouts if self.checkouts else 0.0
+        return {
+            'max_pool_size': settings.MONGODB_MAX_POOL_SIZE,
+            'min_pool_size': settings.MONGODB_MIN_POOL_SIZE,
+            'open': self.open_connections,
+            'checked_out': self.checked_out,
+            'available': max(0, self.open_connections - self.checked_out),
+            'checkouts': self.checkouts,
+            'checkout_failures': self.checkout_failures,
+            'avg_wait_ms': round(avg_wait, 3),
+            'max_wait_ms': round(self.max_wait_ms, 3),
+        }
+
+    def connection_created(self, event):
+        self.open_connections += 1
+
+    def connection_closed(self, event):
+        self.open_connections = max(0, self.open_connections - 1)
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+        self.checkouts += 1
+        duration = getattr(event, 'duration', None)
+        if duration is not None:
+            wait_ms = duration * 1000
+            self.total_wait_ms += wait_ms
+            if wait_ms > self.max_wait_ms:
+                self.max_wait_ms = wait_ms
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        self.checked_out = max(0, self.checked_out - 1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        self.open_connections = 0
+        self.checked_out = 0
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
 
 # Global variables for database connection
 client: AsyncIOMotorClient = None
 db = None
 users_collection = None
+pool_stats = PoolStatsListener()
+# How multi-collection writes are combined: 'bulk', 'transaction' or 'sequential'
+write_mode = 'sequential'
 
 def init_database():
     '''Initialize database connection'''
     global client, db, users_collection
-    
-    client = AsyncIOMotorClient(settings.MONGODB_URL)
+
+    pool_options = {
+        'maxPoolSize': settings.MONGODB_MAX_POOL_SIZE,
+        'minPoolSize': settings.MONGODB_MIN_POOL_SIZE,
+    }
+    if settings.MONGODB_MAX_IDLE_TIME_MS is not None:
+        pool_options['maxIdleTimeMS'] = settings.MONGODB_MAX_IDLE_TIME_MS
+    if settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS is not None:
+        pool_options['waitQueueTimeoutMS'] = settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS
+
+    client = AsyncIOMotorClient(
+        settings.MONGODB_URL,
+        event_listeners=[pool_stats],
+        **pool_options
+    )
     db = client[settings.DATABASE_NAME]
     users_collection = db['users']
 
@@ -21,36 +128,304 @@ def get_users_collection():
 
 
 def get_database():
-    '''Get database instance'''
+    '''Get database instance, initializing the shared client if needed'''
+    if db is None:
+        init_database()
     return db
 
 
+def get_pool_stats() -> dict:
+    '''Get connection pool statistics for the shared client'''
+    return pool_stats.stats()
+
+
+class UserRecord:
+    '''
+    Lightweight view of the user fields a call site asked for.
+
+    Only the projected fields are set; reading any other raises
+    AttributeError instead of silently returning a default.
+    '''
+
+    __slots__ = ('id', 'username', 'hashed_password', 'email_confirmed', 'user_type', 'created_at')
+
+    DEFAULTS = {'email_confirmed': False, 'user_type': 'free'}
+
+    def __init__(self, document: dict, fields: tuple[str, ...]):
+        self.id = str(document['_id'])
+        for field in fields:
+            setattr(self, field, document.get(field, self.DEFAULTS.get(field)))
+
+    def as_dict(self) -> dict:
+        return {
+            name: getattr(self, name)
+            for name in self.__slots__
+            if hasattr(self, name)
+        }
+
+
+# Accounts marked deleted are invisible until the purge job removes them
+ACTIVE = {'deleted_at': None}
+
+# Per-call-site projections; '_id' is always returned
+LOGIN_FIELDS = ('hashed_password', 'email_confirmed')
+PROFILE_FIELDS = ('username', 'email_confirmed', 'user_type')
+STATUS_FIELDS = ('email_confirmed',)
+PASSWORD_FIELDS = ('hashed_password',)
+
+
+def _projection(fields: tuple[str, ...]) -> dict:
+    return {field: 1 for field in fields}
+
+
+@timed('db')
+async def find_user_by_username(username: str, fields: tuple[str, ...]) -> UserRecord | None:
+    '''Get only the given fields of a user by username'''
+    document = await users_collection.find_one({'username': username, **ACTIVE}, _projection(fields))
+    return UserRecord(document, fields) if document else None
+
+
+@timed('db')
+async def find_user_by_id(user_id: str, fields: tuple[str, ...]) -> UserRecord | None:
+    '''Get only the given fields of a user by ID'''
+    from bson import ObjectId
+    try:
+        object_id = ObjectId(user_id)
+    except Exception:
+        return None
+    document = await users_collection.find_one({'_id': object_id, **ACTIVE}, _projection(fields))
+    return UserRecord(document, fields) if document else None
+
+
+@timed('db')
+async def confirm_email(username: str, confirmed_at) -> UserRecord | None:
+    '''
+    Set email_confirmed unless it is already set, in one round trip.
+
+    Returns the user as it was before the update (STATUS_FIELDS), so the
+    caller can tell "verified now" from "already confirmed"; None if
+    there is no such user.
+    '''
+    document = await users_collection.find_one_and_update(
+        {'username': username, **ACTIVE},
+        # Pipeline update: keeps an existing confirmation timestamp
+        [{'$set': {'email_confirmed': {
+            '$cond': [{'$not': ['$email_confirmed']}, confirmed_at, '$email_confirmed']
+        }}}],
+        projection=_projection(STATUS_FIELDS),
+        return_document=ReturnDocument.BEFORE
+    )
+    return UserRecord(document, STATUS_FIELDS) if document else None
+
+
+@timed('db')
+async def reset_password_hash(username: str, hashed_password: str, reset_at) -> UserRecord | None:
+    '''
+    Replace the password of a confirmed user.
+
+    Unconfirmed users are left unchanged. Returns the user as it was
+    before the update (STATUS_FIELDS), or None if there is no such user.
+    '''
+    # A plain $set: in a pipeline update the "$2b$..." hash would be read
+    # as a field path. Only a miss needs the second read, to tell
+    # "unconfirmed" from "no such user".
+    document = await users_collection.find_one_and_update(
+        {'username': username, 'email_confirmed': {'$nin': [None, False]}, **ACTIVE},
+        {'$set': {'hashed_password': hashed_password, 'password_reset_at': reset_at}},
+        projection=_projection(STATUS_FIELDS),
+        return_document=ReturnDocument.BEFORE
+    )
+    if document is None:
+        return await find_user_by_username(username, STATUS_FIELDS)
+    return UserRecord(document, STATUS_FIELDS)
+
+
+@timed('db')
+async def replace_password_hash(user_id: str, old_hash: str, new_hash: str) -> bool:
+    '''Swap in a re-hashed password unless the password changed meanwhile'''
+    from bson import ObjectId
+    result = await users_collection.update_one(
+        {'_id': ObjectId(user_id), 'hashed_password': old_hash, **ACTIVE},
+        {'$set': {'hashed_password': new_hash}}
+    )
+    return result.modified_count > 0
+
+
+@timed('db')
 async def get_user_by_username(username: str):
     '''Get user by username'''
-    return await users_collection.find_one({'username': username})
+    return await users_collection.find_one({'username': username, **ACTIVE})
 
 
+@timed('db')
 async def get_user_by_id(user_id: str):
     '''Get user by ID'''
     from bson import ObjectId
     try:
-        return await users_collection.find_one({'_id': ObjectId(user_id)})
+        return await users_collection.find_one({'_id': ObjectId(user_id), **ACTIVE})
     except Exception:
         return None
 
 
+@timed('db')
+async def get_user_profile(user_id: str):
+    '''Get the public user fields, served from the user cache when possible'''
+    record = user_cache.get_by_id(user_id)
+    if record is not None:
+        return record
+
+    # Taken before the read so an invalidation during it wins
+    generation = user_cache.generation()
+    user = await find_user_by_id(user_id, PROFILE_FIELDS)
+    if not user:
+        return None
+
+    record = user.as_dict()
+    user_cache.put(record, generation)
+    return record
+
+
+async def detect_write_mode() -> str:
+    '''Pick the cheapest atomic multi-collection write this deployment supports'''
+    if settings.MONGODB_MULTI_WRITE_MODE != 'auto':
+        return settings.MONGODB_MULTI_WRITE_MODE
+    try:
+        hello = await client.admin.command('hello')
+        build_info = await client.admin.command('buildInfo')
+    except Exception:
+        return 'sequential'
+    # Client-level bulkWrite spans collections in one round trip (MongoDB 8.0+)
+    if build_info.get('versionArray', [0])[0] >= 8:
+        return 'bulk'
+    if hello.get('setName') or hello.get('msg') == 'isdbgrid':
+        return 'transaction'
+    return 'sequential'
+
+
+@timed('db')
+async def insert_user_with_task(user_document: dict, task_document: dict) -> None:
+    '''
+    Insert a new user and its first processing task together.
+
+    The unique username index makes the user insert the existence check:
+    a duplicate raises DuplicateKeyError and no task is written. Depending
+    on write_mode both inserts go out as one ordered client bulkWrite, in a
+    transaction, or one after the other.
+    '''
+    if write_mode == 'bulk':
+        try:
+            await client.bulk_write([
+                InsertOne(user_document, namespace=f'{settings.DATABASE_NAME}.users'),
+                InsertOne(task_document, namespace=f'{settings.DATABASE_NAME}.processing_tasks'),
+            ], ordered=True)
+        except ClientBulkWriteException as e:
+            for error in e.write_errors or []:
+                if error.get('code') == 11000:
+                    raise DuplicateKeyError(error.get('errmsg', 'duplicate key'), 11000, error)
+            raise
+        return
+
+    if write_mode == 'transaction':
+        async with await client.start_session() as session:
+            async with session.start_transaction():
+                await users_collection.insert_one(user_document, session=session)
+                await db['processing_tasks'].insert_one(task_document, session=session)
+        return
+
+    await users_collection.insert_one(user_document)
+    await db['processing_tasks'].insert_one(task_document)
+
+
+# Index options compared against the live index; unique/sparse default to False
+COMPARED_INDEX_OPTIONS = ('unique', 'sparse', 'expireAfterSeconds', 'partialFilterExpression')
+
+
+def _option_differences(index: dict, options: dict) -> dict:
+    '''Required options whose value differs on an existing index'''
+    differences = {}
+    for option in COMPARED_INDEX_OPTIONS:
+        wanted, actual = options.get(option), index.get(option)
+        if option in ('unique', 'sparse'):
+            wanted, actual = bool(wanted), bool(actual)
+        if wanted != actual:
+            differences[option] = wanted
+    return differences
+
+
+async def ensure_indexes():
+    '''
+    Create any missing required index, reporting progress as it goes.
+
+    A TTL index whose expireAfterSeconds changed is updated in place with
+    collMod; other option changes need the index dropped by hand first.
+    '''
+    total = len(REQUIRED_INDEXES)
+    for position, (collection, name, keys, options) in enumerate(REQUIRED_INDEXES, start=1):
+        started = time.perf_counter()
+        try:
+            existing = (await db[collection].index_information()).get(name)
+            differences = _option_differences(existing, options) if existing else {}
+            if existing and list(existing['key']) == keys and set(differences) == {'expireAfterSeconds'}:
+                await db.command({'collMod': collection, 'index': {
+                    'name': name, 'expireAfterSeconds': differences['expireAfterSeconds']
+                }})
+                action = f'TTL set to {differences["expireAfterSeconds"]}s'
+            else:
+                await db[collection].create_index(keys, name=name, **options)
+                action = 'ready'
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f'✅ Index {position}/{total} {collection}.{name} {action} ({elapsed:.0f} ms)')
+        except Exception as e:
+            print(f'❌ Index {position}/{total} {collection}.{name} failed: {e}')
+
+
+async def get_missing_indexes() -> list[str]:
+    '''Return "collection.name" for every required index that does not exist or differs in keys or options'''
+    missing = []
+    existing_by_collection = {}
+    for collection, name, keys, options in REQUIRED_INDEXES:
+        if collection not in existing_by_collection:
+            existing_by_collection[collection] = await db[collection].index_information()
+        index = existing_by_collection[collection].get(name)
+        if index is None or list(index['key']) != keys or _option_differences(index, options):
+            missing.append(f'{collection}.{name}')
+    return missing
+
+
 async def connect_to_mongo():
     '''Connect to MongoDB on application startup'''
-    init_database()
+    if client is None:
+        init_database()
     # Test the connection
     try:
         await client.admin.command('ping')
         print('✅ Successfully connected to MongoDB')
     except Exception as e:
         print(f'❌ Error connecting to MongoDB: {e}')
+        return
+    await ensure_indexes()
+
+    global write_mode
+    write_mode = await detect_write_mode()
+    print(f'✅ Multi-collection writes use {write_mode} mode')
+
+async def warm_pool(connections: int) -> int:
+    '''Open pool connections up front with concurrent pings; returns how many succeeded'''
+    if settings.MONGODB_MAX_POOL_SIZE:
+        connections = min(connections, settings.MONGODB_MAX_POOL_SIZE)
+    if client is None or connections <= 0:
+        return 0
+    results = await asyncio.gather(
+        *(client.admin.command('ping') for _ in range(connections)), return_exceptions=True
+    )
+    return sum(1 for result in results if not isinstance(result, Exception))
 
 async def close_mongo_connection():
     '''Close MongoDB connection on application shutdown'''
+    global client, db, users_collection
     if client:
         client.close()
+        client = None
+        db = None
+        users_collection = None
         print('✅ MongoDB connection closed')
@@ -1,6 +1,14 @@
 from fastapi import Request, FastAPI
 from fastapi.responses import JSONResponse
-from authx.exceptions import JWTDecodeError, AccessTokenRequiredError, MissingTokenError
+from authx.exceptions import JWTDecodeError, AccessTokenRequiredError, MissingTokenError, RevokedTokenError
+
+
+class HasherSaturatedError(Exception):
+    '''Raised when the password hashing pool has no admission capacity left'''
+
+    def __init__(self, retry_after: int):
+        super().__init__('Password hashing pool is saturated')
+        self.retry_after = retry_after
 
 
 async def jwt_decode_error_handler(request: Request, exc: JWTDecodeError):
@@ -12,7 +20,19 @@ async def access_token_required_handler(request: Request, exc: AccessTokenRequir
 async def missing_token_error_handler(request: Request, exc: MissingTokenError):
     return JSONResponse(status_code=401, content={'detail': 'Authentication required'})
 
+async def revoked_token_error_handler(request: Request, exc: RevokedTokenError):
+    return JSONResponse(status_code=401, content={'detail': 'Token has been revoked'})
+
+async def hasher_saturated_handler(request: Request, exc: HasherSaturatedError):
+    return JSONResponse(
+        status_code=503,
+        content={'detail': 'Server busy, please retry shortly'},
+        headers={'Retry-After': str(exc.retry_after)}
+    )
+
 def register_exception_handlers(app: FastAPI):
     app.add_exception_handler(JWTDecodeError, jwt_decode_error_handler)
     app.add_exception_handler(AccessTokenRequiredError, access_token_required_handler)
-    app.add_exception_handler(MissingTokenError, missing_token_error_handler)
\ No newline at end of file
+    app.add_exception_handler(MissingTokenError, missing_token_error_handler)
+    app.add_exception_handler(RevokedTokenError, revoked_token_error_handler)
+    app.add_exception_handler(HasherSaturatedError, hasher_saturated_handler)
@@ -0,0 +1,66 @@
+'''
+Streaming GDPR export: user data is serialized one document at a time so
+memory per export stays flat however much history a user has.
+'''
+
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+from utils import db as mongo
+from utils.config import settings
+from utils.responses import dumps
+
+
+# Fields never included in an export
+USER_EXCLUDED_FIELDS = {'hashed_password': 0}
+TASK_EXCLUDED_FIELDS = {'email_data.token': 0, 'locked_by': 0, 'locked_until': 0}
+
+
+async def _stream_collection(cursor) -> AsyncIterator[bytes]:
+    '''Yield a JSON array one cursor document at a time'''
+    yield b'['
+    first = True
+    async for document in cursor:
+        yield (b'\n' if first else b',\n') + dumps(document, indent=True)
+        first = False
+    yield b'\n]'
+
+
+async def stream_user_export(user: dict) -> AsyncIterator[bytes]:
+    '''
+    Yield the export of an already-loaded user as UTF-8 JSON chunks.
+
+    Related collections are read through cursors with EXPORT_BATCH_SIZE,
+    so at most one batch is held in memory at a time.
+    '''
+    database = mongo.get_database()
+    export_info = {
+        'exported_at': datetime.now(timezone.utc),
+        'service': 'Auth export data'
+    }
+    yield b'{\n"export_info": ' + dumps(export_info, indent=True) + b',\n"user": ' + dumps(user, indent=True)
+
+    # Registration tasks are keyed by username, reset and later ones by id
+    owners = [str(user['_id'])]
+    if user.get('username'):
+        owners.append(user['username'])
+    tasks = database['processing_tasks'].find(
+        {'user_id': {'$in': owners}}, TASK_EXCLUDED_FIELDS,
+        batch_size=settings.EXPORT_BATCH_SIZE
+    ).sort('created_at', 1)
+
+    yield b',\n"processing_tasks": '
+    async for chunk in _stream_collection(tasks):
+        yield chunk
+    yield b'\n}\n'
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    '''Compress a byte stream incrementally into a gzip member'''
+    compressor = zlib.compressobj(settings.EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
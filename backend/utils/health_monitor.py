@@ -0,0 +1,163 @@
+'''
+Background dependency checks for the health endpoints.
+
+Probes read the last snapshot instead of talking to Mongo or SMTP, so a
+probe costs microseconds and a dependency brownout cannot pile them up.
+'''
+
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from utils import db
+from utils.config import settings
+from utils.mail import smtp_pool
+
+
+async def check_database() -> dict:
+    started = time.perf_counter()
+    await db.client.admin.command('ping')
+    ping_ms = (time.perf_counter() - started) * 1000
+    missing_indexes = await db.get_missing_indexes()
+    pool = db.get_pool_stats()
+    # Missing indexes degrade the service but the database is reachable;
+    # readiness must not take every pod out of rotation over them
+    return {
+        "status": "degraded" if missing_indexes else "healthy",
+        "message": (
+            f"Missing or outdated required indexes: {', '.join(missing_indexes)}"
+            if missing_indexes else "Connected to MongoDB"
+        ),
+        "database_name": settings.DATABASE_NAME,
+        "ping_ms": round(ping_ms, 3),
+        "pool_saturation": round(pool['checked_out'] / max(pool['max_pool_size'], 1), 3),
+        "pool": pool,
+    }
+
+
+async def check_smtp() -> dict:
+    if settings.MAIL_CONSOLE:
+        return {"status": "healthy", "message": "Console mail mode"}
+    if not all([settings.MAIL_SERVER, settings.MAIL_USERNAME, settings.MAIL_FROM, settings.MAIL_PORT]):
+        return {"status": "unhealthy", "message": "SMTP configuration incomplete"}
+
+    # A TCP connect is enough to tell the server is reachable without a login
+    started = time.perf_counter()
+    _, writer = await asyncio.open_connection(settings.MAIL_SERVER, int(settings.MAIL_PORT))
+    connect_ms = (time.perf_counter() - started) * 1000
+    writer.close()
+    await writer.wait_closed()
+
+    return {
+        "status": "healthy",
+        "message": "SMTP server reachable",
+        "server": settings.MAIL_SERVER,
+        "port": settings.MAIL_PORT,
+        "connect_ms": round(connect_ms, 3),
+        "pool": smtp_pool.stats(),
+    }
+
+
+async def check_email_queue() -> dict:
+    now = datetime.now(timezone.utc)
+    tasks = db.get_database()['processing_tasks']
+    backlog = await tasks.count_documents({'status': 'pending', 'run_after': {'$lte': now}})
+    oldest = await tasks.find_one(
+        {'status': 'pending', 'run_after': {'$lte': now}}, {'run_after': 1}, sort=[('run_after', 1)]
+    )
+    oldest_age = None
+    if oldest is not None:
+        run_after = oldest['run_after']
+        if run_after.tzinfo is None:
+            run_after = run_after.replace(tzinfo=timezone.utc)
+        oldest_age = round((now - run_after).total_seconds(), 3)
+    over_limit = backlog > settings.HEALTH_MAX_QUEUE_BACKLOG
+    return {
+        "status": "unhealthy" if over_limit else "healthy",
+        "message": f"{backlog} runnable task(s) waiting",
+        "backlog": backlog,
+        "oldest_pending_seconds": oldest_age,
+    }
+
+
+class HealthMonitor:
+    '''
+    Runs every check on an interval, each under its own timeout, and keeps
+    the latest result per check.
+
+    Results older than ``stale_after`` seconds are reported as stale and
+    count as unhealthy, so a stuck monitor cannot keep a pod ready.
+    '''
+
+    def __init__(self, checks: dict, interval: float, timeout: float, stale_after: float):
+        self.checks = checks
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self._results: dict[str, dict] = {}
+        self._runner: asyncio.Task | None = None
+
+    async def _run_check(self, name: str, check) -> None:
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(check(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            result = {"status": "unhealthy", "message": f"Check timed out after {self.timeout}s"}
+        except Exception as e:
+            result = {"status": "unhealthy", "message": f"Check failed: {str(e)}"}
+        result["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        result["checked_at"] = time.time()
+        self._results[name] = result
+
+    async def refresh(self) -> None:
+        '''Run all checks concurrently and store their results'''
+        await asyncio.gather(*(self._run_check(name, check) for name, check in self.checks.items()))
+
+    async def _refresh_forever(self) -> None:
+        # A refresh awaited during startup already produced the first results
+        if self._results:
+            await asyncio.sleep(self.interval)
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._refresh_forever())
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    def get(self, name: str) -> dict:
+        '''Cached result of one check with its age; never awaits'''
+        result = self._results.get(name)
+        if result is None:
+            return {"status": "unknown", "message": "Not checked yet"}
+        age = time.time() - result["checked_at"]
+        snapshot = dict(result)
+        snapshot["checked_at"] = datetime.fromtimestamp(result["checked_at"], timezone.utc).isoformat()
+        snapshot["age_seconds"] = round(age, 3)
+        if age > self.stale_after:
+            snapshot["status"] = "stale"
+        return snapshot
+
+    def snapshot(self) -> dict:
+        return {name: self.get(name) for name in self.checks}
+
+
+health_monitor = HealthMonitor(
+    checks={
+        "database": check_database,
+        "smtp": check_smtp,
+        "email_queue": check_email_queue,
+    },
+    interval=settings.HEALTH_CHECK_INTERVAL,
+    timeout=settings.HEALTH_CHECK_TIMEOUT,
+    stale_after=settings.HEALTH_STALE_SECONDS,
+)
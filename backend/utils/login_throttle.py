@@ -0,0 +1,154 @@
+'''
+In-memory login throttling that rejects hot usernames and subnets before
+the user lookup and bcrypt verification run.
+'''
+
+import ipaddress
+import time
+from collections import OrderedDict
+
+from utils.config import settings
+
+
+class FailureCounter:
+    '''
+    Bounded LRU of failure counts per key, each expiring ``window`` seconds
+    after its first failure. The least recently touched key is evicted once
+    ``max_keys`` is reached, so memory stays flat under spraying attacks.
+    '''
+
+    def __init__(self, window: int, max_keys: int):
+        self.window = window
+        self.max_keys = max(1, max_keys)
+        self._entries: OrderedDict[str, list] = OrderedDict()
+        self.evictions = 0
+
+    def count(self, key: str, now: float) -> int:
+        entry = self._entries.get(key)
+        if entry is None:
+            return 0
+        if entry[1] <= now:
+            del self._entries[key]
+            return 0
+        return entry[0]
+
+    def retry_after(self, key: str, now: float) -> int:
+        entry = self._entries.get(key)
+        return max(1, int(entry[1] - now)) if entry else 1
+
+    def add(self, key: str, now: float) -> int:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= now:
+            entry = [0, now + self.window]
+            self._entries[key] = entry
+            if len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        self._entries.move_to_end(key)
+        entry[0] += 1
+        return entry[0]
+
+    def reset(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def subnet_key(ip: str) -> str:
+    '''Group IPv4 addresses by /24 and IPv6 by /64'''
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return ip
+    prefix = 24 if address.version == 4 else 64
+    return str(ipaddress.ip_network(f'{address}/{prefix}', strict=False))
+
+
+def user_key(username: str, ip: str) -> str:
+    '''
+    Per-username failures are counted per client subnet, so failures sent
+    from elsewhere cannot lock the real user out of their own account
+    '''
+    return f'{username.lower()}|{subnet_key(ip)}'
+
+
+class LoginThrottle:
+    '''
+    Tracks failed logins per (username, client subnet), per username across
+    all subnets, and per client subnet.
+
+    The per-account limit is higher than the per-subnet one: it only trips
+    when guesses against one account come from many subnets, which the
+    other two counters never see.
+    '''
+
+    def __init__(self, enabled: bool, max_user_failures: int, max_account_failures: int,
+                 max_subnet_failures: int, window: int, max_keys: int):
+        self.enabled = enabled
+        self.max_user_failures = max_user_failures
+        self.max_account_failures = max_account_failures
+        self.max_subnet_failures = max_subnet_failures
+        self.users = FailureCounter(window, max_keys)
+        self.accounts = FailureCounter(window, max_keys)
+        self.subnets = FailureCounter(window, max_keys)
+        self.rejected_user = 0
+        self.rejected_account = 0
+        self.rejected_subnet = 0
+
+    def check(self, username: str, ip: str) -> int | None:
+        '''Return a Retry-After in seconds if this attempt should be refused'''
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        key = user_key(username, ip)
+        if self.users.count(key, now) >= self.max_user_failures:
+            self.rejected_user += 1
+            return self.users.retry_after(key, now)
+        account = username.lower()
+        if self.accounts.count(account, now) >= self.max_account_failures:
+            self.rejected_account += 1
+            return self.accounts.retry_after(account, now)
+        subnet = subnet_key(ip)
+        if self.subnets.count(subnet, now) >= self.max_subnet_failures:
+            self.rejected_subnet += 1
+            return self.subnets.retry_after(subnet, now)
+        return None
+
+    def record_failure(self, username: str, ip: str) -> None:
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        self.users.add(user_key(username, ip), now)
+        self.accounts.add(username.lower(), now)
+        self.subnets.add(subnet_key(ip), now)
+
+    def record_success(self, username: str, ip: str) -> None:
+        # The account counter is left alone: a distributed attack must not be
+        # reset by the real user logging in meanwhile
+        if self.enabled:
+            self.users.reset(user_key(username, ip))
+
+    def stats(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'tracked_users': len(self.users),
+            'tracked_accounts': len(self.accounts),
+            'tracked_subnets': len(self.subnets),
+            'rejected_by_user': self.rejected_user,
+            'rejected_by_account': self.rejected_account,
+            'rejected_by_subnet': self.rejected_subnet,
+            # Each rejection skips one user lookup and one bcrypt verify
+            'hashes_avoided': self.rejected_user + self.rejected_account + self.rejected_subnet,
+            'evictions': self.users.evictions + self.accounts.evictions + self.subnets.evictions,
+        }
+
+
+login_throttle = LoginThrottle(
+    enabled=settings.LOGIN_THROTTLE_ENABLED,
+    max_user_failures=settings.LOGIN_MAX_FAILURES_PER_USER,
+    max_account_failures=settings.LOGIN_MAX_FAILURES_PER_ACCOUNT,
+    max_subnet_failures=settings.LOGIN_MAX_FAILURES_PER_SUBNET,
+    window=settings.LOGIN_THROTTLE_WINDOW_SECONDS,
+    max_keys=settings.LOGIN_THROTTLE_MAX_KEYS,
+)
@@ -1,6 +1,10 @@
 from .config import settings
+from .metrics import timed
+from contextlib import asynccontextmanager
 from email.message import EmailMessage
-import aiosmtplib
+from string import Formatter
+import asyncio
+import time
 from pathlib import Path
 
 
@@ -15,6 +19,168 @@ MAIL_USERNAME = settings.MAIL_USERNAME
 # Get the templates directory path
 TEMPLATES_DIR = Path(__file__).parent.parent / 'templates'
 
+# Templates sent by the app, keyed by file name, with their subject lines
+EMAIL_TEMPLATES = {
+    'email_verification.html': 'Email Verification',
+    'password_reset.html': 'Password Reset',
+}
+
+# SMTP forbids lines longer than 998 octets in 7bit bodies
+MAX_7BIT_LINE = 998
+
+
+class PreparedMessage:
+    '''Fully encoded message ready for SMTP DATA'''
+
+    __slots__ = ('sender', 'recipients', 'data')
+
+    def __init__(self, sender: str, recipients: list[str], data: bytes):
+        self.sender = sender
+        self.recipients = recipients
+        self.data = data
+
+
+class PooledSMTPConnection:
+    '''Authenticated SMTP session tracked by the pool'''
+
+    def __init__(self):
+        # aiosmtplib is only needed where mail is actually sent (the worker)
+        import aiosmtplib
+        self.client = aiosmtplib.SMTP(
+            hostname=MAIL_SERVER,
+            port=MAIL_PORT,
+            use_tls=settings.MAIL_USE_TLS
+        )
+        self.messages_sent = 0
+        self.last_used = 0.0
+
+    async def open(self) -> None:
+        await self.client.connect()
+        await self.client.login(MAIL_USERNAME, MAIL_PASSWORD)
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+    async def close(self) -> None:
+        try:
+            if self.client.is_connected:
+                await self.client.quit()
+        except Exception:
+            self.client.close()
+
+    async def send(self, message: EmailMessage | PreparedMessage) -> None:
+        if isinstance(message, PreparedMessage):
+            await self.client.sendmail(message.sender, message.recipients, message.data)
+        else:
+            await self.client.send_message(message)
+        self.messages_sent += 1
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    '''
+    Keeps up to ``size`` authenticated SMTP sessions open and reuses them.
+
+    Idle sessions are probed with NOOP before reuse, dropped sessions are
+    reconnected, and a session is retired after ``max_messages`` sends.
+    '''
+
+    def __init__(self, size: int, max_messages: int, keepalive: int):
+        self.size = max(1, size)
+        self.max_messages = max(1, max_messages)
+        self.keepalive = keepalive
+        self._idle: asyncio.LifoQueue | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._in_use = 0
+        self._closed = False
+
+    def _ensure_started(self) -> None:
+        if self._slots is None:
+            self._idle = asyncio.LifoQueue()
+            self._slots = asyncio.Semaphore(self.size)
+            self._closed = False
+
+    async def _checkout(self) -> PooledSMTPConnection:
+        while not self._idle.empty():
+            conn = self._idle.get_nowait()
+            if not conn.client.is_connected:
+                continue
+            if time.monotonic() - conn.last_used < self.keepalive:
+                return conn
+            try:
+                await conn.client.noop()
+                conn.last_used = time.monotonic()
+                return conn
+            except Exception:
+                conn.client.close()
+
+        conn = PooledSMTPConnection()
+        try:
+            await conn.open()
+        except BaseException:
+            # Connected but login failed (or was cancelled): don't leak the socket
+            await conn.close()
+            raise
+        return conn
+
+    async def _checkin(self, conn: PooledSMTPConnection, healthy: bool) -> None:
+        if not healthy or self._closed or conn.messages_sent >= self.max_messages:
+            await conn.close()
+        else:
+            self._idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def connection(self):
+        '''Borrow an authenticated session from the pool'''
+        import aiosmtplib
+        self._ensure_started()
+        async with self._slots:
+            self._in_use += 1
+            try:
+                conn = await self._checkout()
+                healthy = True
+                try:
+                    yield conn
+                except aiosmtplib.SMTPServerDisconnected:
+                    healthy = False
+                    raise
+                finally:
+                    await self._checkin(conn, healthy and conn.client.is_connected)
+            finally:
+                self._in_use -= 1
+
+    async def send_messages(self, messages: list[EmailMessage | PreparedMessage]) -> None:
+        '''Send several messages over a single session'''
+        import aiosmtplib
+        async with self.connection() as conn:
+            for message in messages:
+                try:
+                    await conn.send(message)
+                except aiosmtplib.SMTPServerDisconnected:
+                    # Session dropped mid-batch, reconnect once and carry on
+                    await conn.open()
+                    await conn.send(message)
+
+    def stats(self) -> dict:
+        idle = self._idle.qsize() if self._idle else 0
+        return {'size': self.size, 'idle': idle, 'in_use': self._in_use}
+
+    async def close(self) -> None:
+        '''Quit every idle session; borrowed sessions close on return'''
+        self._closed = True
+        if self._idle is None:
+            return
+        while not self._idle.empty():
+            await self._idle.get_nowait().close()
+        self._idle = None
+        self._slots = None
+
+
+smtp_pool = SMTPConnectionPool(
+    size=settings.MAIL_POOL_SIZE,
+    max_messages=settings.MAIL_MAX_MESSAGES_PER_CONNECTION,
+    keepalive=settings.MAIL_KEEPALIVE_SECONDS,
+)
+
 
 def load_email_template(template_name: str) -> str:
     template_path = TEMPLATES_DIR / template_name
@@ -22,43 +188,145 @@ def load_email_template(template_name: str) -> str:
         return file.read()
 
 
-async def send_email(to_email: str, subject: str, html_body: str) -> None:
-    if MAIL_CONSOLE:
-        print(f'📨 FAKE SEND to {to_email} — subject: {subject}')
-        print(html_body)
-        return
+class CompiledTemplate:
+    '''
+    str.format template split once into literal chunks and field names.
+
+    When the template is plain ASCII with short lines, the MIME headers and
+    the 7bit-encoded literal chunks are also prebuilt, so a send only joins
+    bytes around the recipient and the substituted fields.
+    '''
+
+    def __init__(self, source: str, subject: str, mtime: float):
+        self.mtime = mtime
+        self.subject = subject
+        self.literals: list[str] = []
+        self.fields: list[str | None] = []
+        for literal, field, _spec, _conv in Formatter().parse(source):
+            self.literals.append(literal)
+            self.fields.append(field)
+
+        longest_line = max((len(line) for line in source.splitlines()), default=0)
+        # Room left on the longest line for a substituted value
+        self.max_value_length = MAX_7BIT_LINE - longest_line
+        self.mime_ready = source.isascii() and self.max_value_length > 0 and (
+            _header_safe(MAIL_FROM) and _header_safe(subject)
+        )
+        if self.mime_ready:
+            self.header_prefix = (
+                f'From: {MAIL_FROM}\r\n'
+                f'Subject: {subject}\r\n'
+                'MIME-Version: 1.0\r\n'
+                'Content-Type: text/html; charset="utf-8"\r\n'
+                'Content-Transfer-Encoding: 7bit\r\n'
+                'To: '
+            ).encode('ascii')
+            self.literal_bytes = [
+                literal.replace('\r\n', '\n').replace('\n', '\r\n').encode('ascii')
+                for literal in self.literals
+            ]
+
+    def render(self, **values: str) -> str:
+        parts = []
+        for literal, field in zip(self.literals, self.fields):
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(values[field]))
+        return ''.join(parts)
+
+    def prepare(self, to_email: str, **values: str) -> PreparedMessage | None:
+        '''Build the wire message from the skeleton, or None if it needs full MIME'''
+        if not self.mime_ready or not _header_safe(to_email):
+            return None
+        parts = [self.header_prefix, to_email.encode('ascii'), b'\r\n\r\n']
+        for literal, field in zip(self.literal_bytes, self.fields):
+            parts.append(literal)
+            if field is not None:
+                value = str(values[field])
+                if not _header_safe(value) or len(value) >= self.max_value_length:
+                    return None
+                parts.append(value.encode('ascii'))
+        return PreparedMessage(MAIL_FROM, [to_email], b''.join(parts))
+
+
+def _header_safe(value: str | None) -> bool:
+    return bool(value) and value.isascii() and '\r' not in value and '\n' not in value
+
+
+_template_cache: dict[str, CompiledTemplate] = {}
+
+
+def get_email_template(template_name: str) -> CompiledTemplate:
+    '''Get a compiled template, re-reading it on mtime change when reload is on'''
+    compiled = _template_cache.get(template_name)
+    if compiled is not None and not settings.MAIL_TEMPLATE_RELOAD:
+        return compiled
+
+    template_path = TEMPLATES_DIR / template_name
+    mtime = template_path.stat().st_mtime
+    if compiled is None or compiled.mtime != mtime:
+        compiled = CompiledTemplate(
+            load_email_template(template_name),
+            EMAIL_TEMPLATES.get(template_name, ''),
+            mtime
+        )
+        _template_cache[template_name] = compiled
+    return compiled
+
 
+def preload_email_templates() -> None:
+    '''Compile every known template so the first send skips disk I/O'''
+    for template_name in EMAIL_TEMPLATES:
+        get_email_template(template_name)
+
+
+def build_message(to_email: str, subject: str, html_body: str) -> EmailMessage:
     message = EmailMessage()
     message['From'] = MAIL_FROM
     message['To'] = to_email
     message['Subject'] = subject
     message.set_content(html_body, subtype='html')
+    return message
+
+
+@timed('mail')
+async def send_email(to_email: str, subject: str, html_body: str) -> None:
+    if MAIL_CONSOLE:
+        print(f'📨 FAKE SEND to {to_email} — subject: {subject}')
+        print(html_body)
+        return
+
+    message = build_message(to_email, subject, html_body)
+    await _deliver(message)
+
+
+@timed('mail')
+async def send_template_email(to_email: str, template_name: str, **values: str) -> None:
+    template = get_email_template(template_name)
+    if MAIL_CONSOLE:
+        await send_email(to_email, template.subject, template.render(**values))
+        return
+
+    message = template.prepare(to_email, **values)
+    if message is None:
+        message = build_message(to_email, template.subject, template.render(**values))
+    await _deliver(message)
 
-    client = aiosmtplib.SMTP(
-        hostname=MAIL_SERVER,
-        port=MAIL_PORT,
-        use_tls=True
-    )
 
+async def _deliver(message: EmailMessage | PreparedMessage) -> None:
     try:
-        await client.connect()
-        await client.login(MAIL_USERNAME, MAIL_PASSWORD)
-        await client.send_message(message)
+        await smtp_pool.send_messages([message])
     except Exception as e:
         print(f'❌ Email send failed: {e}')
-    finally:
-        await client.quit()
+        # Let the queue worker decide whether to retry
+        raise
 
 
 async def send_verification_email(email: str, token: str) -> None:
     url = f'{ROOT_URL}/verify-email/{token}'
-    template = load_email_template('email_verification.html')
-    html_body = template.format(verification_url=url)
-    await send_email(email, 'Email Verification', html_body)
+    await send_template_email(email, 'email_verification.html', verification_url=url)
 
 
 async def send_password_reset_email(email: str, token: str) -> None:
     url = f'{ROOT_URL}/reset-password/{token}'
-    template = load_email_template('password_reset.html')
-    html_body = template.format(reset_url=url)
-    await send_email(email, 'Password Reset', html_body)
+    await send_template_email(email, 'password_reset.html', reset_url=url)
@@ -0,0 +1,293 @@
+'''
+Minimal Prometheus-compatible metrics: counters, gauges and histograms
+rendered in the text exposition format by the /metrics endpoint.
+
+With METRICS_ENABLED=false the middleware is not installed, the endpoint
+is not mounted and ``timed`` returns functions undecorated.
+'''
+
+import asyncio
+import functools
+from abc import ABC, abstractmethod
+import threading
+import time
+from bisect import bisect_left
+
+from utils.config import settings
+
+
+# Seconds; covers a cache hit (~100 µs) up to a slow SMTP handshake
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class _HistogramSeries:
+    '''One label combination; bucket counts are allocated once up front'''
+
+    __slots__ = ('_buckets', '_counts', '_sum', '_lock')
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self._buckets = buckets
+        # Last slot is the +Inf bucket
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        # Hash timers observe from executor threads
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> tuple[list[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class _CounterSeries:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _Metric(ABC):
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._series: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def header(self) -> list[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    @abstractmethod
+    def render(self) -> list[str]:
+        ...
+
+
+class _SeriesMetric(_Metric):
+    '''Metric whose series are created on first use and updated in place'''
+
+    @abstractmethod
+    def _new_series(self):
+        ...
+
+    def labels(self, *values: str):
+        '''Return the series for these label values, creating it on first use'''
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+
+class Counter(_SeriesMetric):
+    kind = 'counter'
+
+    def _new_series(self):
+        return _CounterSeries()
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for values, series in list(self._series.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, values)} {series.value}')
+        return lines
+
+
+class Gauge(_Metric):
+    '''Gauge whose value is set at scrape time'''
+
+    kind = 'gauge'
+
+    def set(self, values: tuple[str, ...], value: float) -> None:
+        self._series[values] = value
+
+    def clear(self) -> None:
+        self._series = {}
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for values, value in list(self._series.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, values)} {value}')
+        return lines
+
+
+class Histogram(_SeriesMetric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._bucket_labels = [f'le="{bound}"' for bound in self.buckets] + ['le="+Inf"']
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for values, series in list(self._series.items()):
+            counts, total = series.snapshot()
+            cumulative = 0
+            for bucket_label, count in zip(self._bucket_labels, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, bucket_label)
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry(enabled=settings.METRICS_ENABLED)
+
+http_requests = metrics.register(Counter(
+    'http_requests_total', 'HTTP requests by route template and status code',
+    ('method', 'route', 'status')
+))
+http_request_duration = metrics.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route template',
+    ('method', 'route')
+))
+operation_duration = metrics.register(Histogram(
+    'operation_duration_seconds', 'Latency of hot-path calls (hashing, database, tasks, mail)',
+    ('component', 'operation')
+))
+operation_errors = metrics.register(Counter(
+    'operation_errors_total', 'Hot-path calls that raised', ('component', 'operation')
+))
+task_status_updates = metrics.register(Counter(
+    'task_status_updates_total', 'Processing task status transitions made by this process', ('status',)
+))
+tasks_by_status = metrics.register(Gauge(
+    'processing_tasks', 'Processing tasks currently stored, by status (pending is the queue depth)',
+    ('status',)
+))
+
+
+def timed(component: str, operation: str | None = None):
+    '''
+    Record the duration of every call in operation_duration_seconds.
+
+    The series is resolved once when the function is decorated, so a call
+    costs two perf_counter reads and one bucket increment.
+    '''
+    def decorate(func):
+        if not metrics.enabled:
+            return func
+        name = operation or func.__name__
+        series = operation_duration.labels(component, name)
+        errors = operation_errors.labels(component, name)
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except BaseException:
+                    errors.inc()
+                    raise
+                finally:
+                    series.observe(time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                errors.inc()
+                raise
+            finally:
+                series.observe(time.perf_counter() - started)
+        return wrapper
+
+    return decorate
+
+
+class MetricsMiddleware:
+    '''
+    Pure ASGI middleware recording per-route counts and latency.
+
+    Routes are labelled by their path template, looked up by endpoint once
+    and cached, so ``/user/{id}``-style paths never explode the label set.
+    '''
+
+    def __init__(self, app):
+        self.app = app
+        self._templates: dict[object, str] = {}
+
+    def _route_template(self, scope) -> str:
+        endpoint = scope.get('endpoint')
+        if endpoint is None:
+            return 'unmatched'
+        template = self._templates.get(endpoint)
+        if template is None:
+            template = 'unmatched'
+            for route in scope['app'].routes:
+                if getattr(route, 'endpoint', None) is endpoint:
+                    template = route.path
+                    break
+            self._templates[endpoint] = template
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            method = scope['method']
+            route = self._route_template(scope)
+            http_request_duration.labels(method, route).observe(elapsed)
+            http_requests.labels(method, route, str(status_code)).inc()
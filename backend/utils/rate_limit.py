@@ -3,13 +3,28 @@ from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
+from urllib.parse import urlparse
 import time
 import os
 
+from utils.config import settings
+# Registers the shm:// storage scheme with limits
+import utils.rate_limit_storage  # noqa: F401
+
+
+def _storage_options() -> dict:
+    if urlparse(settings.RATE_LIMIT_STORAGE_URI).scheme == 'shm':
+        return {'slots': settings.RATE_LIMIT_SLOTS}
+    return {}
+
+
 # Create limiter instance
 # Disable rate limiting in test environment
 limiter = Limiter(
     key_func=get_remote_address,
+    storage_uri=settings.RATE_LIMIT_STORAGE_URI,
+    storage_options=_storage_options(),
+    strategy=settings.RATE_LIMIT_STRATEGY,
     enabled=os.getenv("TESTING", "false").lower() != "true"
 )
 
@@ -38,6 +53,11 @@ class RateLimits:
     REGISTER = "5/hour" 
     PASSWORD_RESET = "3/hour"
     
+    # Task status endpoints - unauthenticated, so limited per IP; a client
+    # long-polling with ?wait= makes at most a few requests a minute
+    TASK_STATUS = "600/hour"
+    TASK_EVENTS = "60/hour"
+
     # Email endpoints
     EMAIL_VERIFY = "10/hour"
     RESEND_EMAIL = "10/hour"  # Increased from 3/hour for testing
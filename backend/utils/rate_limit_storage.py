@@ -0,0 +1,207 @@
+'''
+Bounded rate-limit counter storage for slowapi/limits.
+
+Registers the ``shm://`` scheme. ``shm://`` on its own keeps the table in
+anonymous memory for a single process; ``shm:///dev/shm/auth-ratelimit``
+maps a file so every worker on the host shares the same counters.
+'''
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from math import floor
+from urllib.parse import urlparse
+
+from limits.storage import SlidingWindowCounterSupport, Storage
+
+
+# Slot layout: key hash (0 = empty), counter, absolute expiry (epoch seconds)
+SLOT = struct.Struct('<Qqd')
+HEADER = struct.Struct('<4sII')
+MAGIC = b'RLT1'
+
+
+class SharedMemoryStorage(Storage, SlidingWindowCounterSupport):
+    '''
+    Fixed-size open-addressing table of counters in (optionally shared) memory.
+
+    Every operation runs under a thread lock and, for file-backed tables,
+    an exclusive flock, so increments are atomic across workers. Expired
+    slots are reused, and when a probe window is full the entry closest to
+    expiry is evicted, so memory stays bounded regardless of key count.
+    '''
+
+    STORAGE_SCHEME = ['shm']
+
+    def __init__(
+        self,
+        uri: str | None = None,
+        wrap_exceptions: bool = False,
+        slots: int = 65536,
+        probe: int = 32,
+        **options
+    ):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.slots = int(slots)
+        self.probe = min(int(probe), self.slots)
+        self.evictions = 0
+        self._thread_lock = threading.Lock()
+        self._fd: int | None = None
+
+        size = HEADER.size + self.slots * SLOT.size
+        path = urlparse(uri).path if uri else ''
+        if path:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            with self._locked():
+                if os.fstat(self._fd).st_size < size:
+                    os.ftruncate(self._fd, size)
+                self._map = mmap.mmap(self._fd, size)
+                magic, slot_count, _ = HEADER.unpack_from(self._map, 0)
+                if magic != MAGIC or slot_count != self.slots:
+                    self._map[:] = bytes(size)
+                    HEADER.pack_into(self._map, 0, MAGIC, self.slots, 0)
+        else:
+            self._map = mmap.mmap(-1, size)
+            HEADER.pack_into(self._map, 0, MAGIC, self.slots, 0)
+
+    @property
+    def base_exceptions(self) -> type[Exception] | tuple[type[Exception], ...]:
+        return (OSError, ValueError)
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            if self._fd is None:
+                yield
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') or 1
+
+    def _offset(self, index: int) -> int:
+        return HEADER.size + index * SLOT.size
+
+    def _find(self, key_hash: int, now: float, create: bool) -> int | None:
+        '''Return the slot offset holding key_hash, claiming one if create is set'''
+        start = key_hash % self.slots
+        free = None
+        oldest = None
+        oldest_expiry = float('inf')
+        for step in range(self.probe):
+            offset = self._offset((start + step) % self.slots)
+            slot_hash, _, expires_at = SLOT.unpack_from(self._map, offset)
+            if slot_hash == key_hash:
+                if expires_at > now:
+                    return offset
+                SLOT.pack_into(self._map, offset, 0, 0, 0.0)
+                slot_hash = 0
+            if slot_hash == 0 or expires_at <= now:
+                if free is None:
+                    free = offset
+            elif expires_at < oldest_expiry:
+                oldest, oldest_expiry = offset, expires_at
+
+        if not create:
+            return None
+        if free is None:
+            free = oldest
+            self.evictions += 1
+        SLOT.pack_into(self._map, free, key_hash, 0, 0.0)
+        return free
+
+    def _incr(self, key: str, expiry: float, amount: int, now: float) -> int:
+        offset = self._find(self._hash(key), now, create=True)
+        slot_hash, count, expires_at = SLOT.unpack_from(self._map, offset)
+        if count == 0:
+            expires_at = now + expiry
+        count += amount
+        SLOT.pack_into(self._map, offset, slot_hash, count, expires_at)
+        return count
+
+    def _get(self, key: str, now: float) -> tuple[int, float]:
+        offset = self._find(self._hash(key), now, create=False)
+        if offset is None:
+            return 0, now
+        _, count, expires_at = SLOT.unpack_from(self._map, offset)
+        return count, expires_at
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        with self._locked():
+            return self._incr(key, expiry, amount, time.time())
+
+    def get(self, key: str) -> int:
+        with self._locked():
+            return self._get(key, time.time())[0]
+
+    def get_expiry(self, key: str) -> float:
+        with self._locked():
+            return self._get(key, time.time())[1]
+
+    def clear(self, key: str) -> None:
+        with self._locked():
+            offset = self._find(self._hash(key), time.time(), create=False)
+            if offset is not None:
+                SLOT.pack_into(self._map, offset, 0, 0, 0.0)
+
+    def check(self) -> bool:
+        return not self._map.closed
+
+    def reset(self) -> int | None:
+        with self._locked():
+            used = 0
+            for index in range(self.slots):
+                if SLOT.unpack_from(self._map, self._offset(index))[0]:
+                    used += 1
+            self._map[HEADER.size:] = bytes(self.slots * SLOT.size)
+            return used
+
+    @staticmethod
+    def _window_keys(key: str, expiry: int, now: float) -> tuple[str, str]:
+        return f'{key}/{int((now - expiry) / expiry)}', f'{key}/{int(now / expiry)}'
+
+    def _sliding_window(self, key: str, expiry: int, now: float) -> tuple[int, float, int, float]:
+        previous_key, current_key = self._window_keys(key, expiry, now)
+        previous_count = self._get(previous_key, now)[0]
+        current_count = self._get(current_key, now)[0]
+        if previous_count == 0:
+            previous_ttl = 0.0
+        else:
+            previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(
+        self, key: str, limit: int, expiry: int, amount: int = 1
+    ) -> bool:
+        if amount > limit:
+            return False
+        with self._locked():
+            now = time.time()
+            previous_count, previous_ttl, current_count, _ = self._sliding_window(key, expiry, now)
+            weighted = previous_count * previous_ttl / expiry + current_count
+            if floor(weighted) + amount > limit:
+                return False
+            # Check and increment happen under one lock, so no race to undo
+            self._incr(self._window_keys(key, expiry, now)[1], 2 * expiry, amount, now)
+            return True
+
+    def get_sliding_window(self, key: str, expiry: int) -> tuple[int, float, int, float]:
+        with self._locked():
+            return self._sliding_window(key, expiry, time.time())
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        now = time.time()
+        for window_key in self._window_keys(key, expiry, now):
+            self.clear(window_key)
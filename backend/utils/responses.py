@@ -0,0 +1,33 @@
+'''
+orjson-backed JSON responses.
+
+FastJSONResponse is the app's default response class. Hot endpoints
+return it directly, which skips FastAPI's jsonable_encoder pass and
+response_model re-validation for payloads whose shape is already fixed.
+'''
+
+import orjson
+from bson import ObjectId
+from bson.json_util import default as bson_default
+from fastapi.responses import JSONResponse
+
+
+def _default(value):
+    '''Encode the BSON types orjson does not know (datetime is native)'''
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return bson_default(value)
+
+
+def dumps(content, indent: bool = False) -> bytes:
+    option = orjson.OPT_NON_STR_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(content, default=_default, option=option)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
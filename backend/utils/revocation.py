@@ -0,0 +1,189 @@
+'''
+Token revocation store: refresh-token rotation by JTI and per-user
+"revoke everything issued before" cut-offs.
+
+Revocations live in the ``revoked_tokens`` collection (expired by a TTL
+index). Per-user cut-offs are mirrored in memory, so checking a token
+costs no database round trip; used refresh-token JTIs stay in Mongo only,
+where the unique insert in ``consume`` decides reuse.
+'''
+
+import asyncio
+import heapq
+import time
+from datetime import datetime, timezone, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+from utils import db as mongo
+from utils.config import settings
+
+
+# Sub-second issue time added to every token; iat has whole-second resolution
+ISSUED_AT_CLAIM = 'iat_precise'
+
+
+def _timestamp(value) -> float | None:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, timedelta):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return None
+
+
+class RevocationStore:
+    '''
+    In-memory mirror of the per-user cut-offs in revoked_tokens, kept in
+    expiry order.
+
+    Revocations made by this process apply immediately; revocations made
+    by other workers are picked up by ``sync`` every ``sync_interval``
+    seconds. Rotation itself is decided by a unique insert in Mongo, so a
+    refresh token can only ever be exchanged once across all workers.
+    '''
+
+    def __init__(self, sync_interval: float, refresh_lifetime: float):
+        self.sync_interval = sync_interval
+        self.refresh_lifetime = refresh_lifetime
+        self._revoked_before: dict[str, float] = {}
+        # (expires_at, user_id) so pruning only touches expired entries
+        self._expiry_heap: list[tuple[float, str]] = []
+        self._last_sync: datetime | None = None
+        # (_id, created_at) of documents inside the sync overlap window
+        self._seen: set[tuple[str, datetime]] = set()
+        self._syncer: asyncio.Task | None = None
+        self.reuse_detected = 0
+
+    def _collection(self):
+        return mongo.get_database()['revoked_tokens']
+
+    def _remember_user(self, user_id: str, revoked_before: float, expires_at: float) -> None:
+        # Only a later cut-off adds a heap entry, so replays cost nothing
+        if revoked_before > self._revoked_before.get(user_id, 0):
+            self._revoked_before[user_id] = revoked_before
+            heapq.heappush(self._expiry_heap, (expires_at, user_id))
+
+    def _prune(self, now: float) -> None:
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, user_id = heapq.heappop(self._expiry_heap)
+            if self._revoked_before.get(user_id, now) + self.refresh_lifetime <= now:
+                del self._revoked_before[user_id]
+
+    def is_revoked(self, payload) -> bool:
+        '''Check a verified payload against the in-memory cut-offs only'''
+        self._prune(time.time())
+        revoked_before = self._revoked_before.get(str(payload.sub))
+        # Tokens minted before the claim existed fall back to the whole-second
+        # iat, so one issued in the revocation's second is still cut off
+        issued_at = _timestamp(getattr(payload, ISSUED_AT_CLAIM, None))
+        if issued_at is None:
+            issued_at = _timestamp(payload.iat)
+        return revoked_before is not None and issued_at is not None and issued_at < revoked_before
+
+    async def consume(self, payload) -> bool:
+        '''
+        Mark a refresh token as used. Returns False if it was already used,
+        in which case every session of that user is revoked.
+        '''
+        expires_at = _timestamp(payload.exp) or time.time() + self.refresh_lifetime
+        now = datetime.now(timezone.utc)
+        try:
+            await self._collection().insert_one({
+                '_id': f'jti:{payload.jti}',
+                'kind': 'jti',
+                'jti': payload.jti,
+                'created_at': now,
+                'expires_at': datetime.fromtimestamp(expires_at, timezone.utc),
+            })
+        except DuplicateKeyError:
+            # A rotated token came back: treat the whole session family as stolen
+            self.reuse_detected += 1
+            await self.revoke_user(str(payload.sub))
+            return False
+        return True
+
+    async def revoke_user(self, user_id: str) -> None:
+        '''Revoke every token of a user issued before now (one upsert by _id)'''
+        now = datetime.now(timezone.utc)
+        revoked_before = now.timestamp()
+        expires_at = revoked_before + self.refresh_lifetime
+        await self._collection().update_one(
+            {'_id': f'user:{user_id}'},
+            {'$set': {
+                'kind': 'user',
+                'user_id': user_id,
+                'revoked_before': revoked_before,
+                'created_at': now,
+                'expires_at': datetime.fromtimestamp(expires_at, timezone.utc),
+            }},
+            upsert=True
+        )
+        self._remember_user(user_id, revoked_before, expires_at)
+
+    async def sync(self) -> int:
+        '''Pull user cut-offs written since the last sync (one indexed query)'''
+        started = datetime.now(timezone.utc)
+        if self._last_sync is None:
+            # Older cut-offs cannot affect any refresh token still alive
+            since = started - timedelta(seconds=self.refresh_lifetime)
+        else:
+            # Overlap by one interval to tolerate clock skew between workers;
+            # documents already applied are skipped via _seen
+            since = self._last_sync - timedelta(seconds=self.sync_interval)
+        count = 0
+        query = {'kind': 'user', 'created_at': {'$gte': since}}
+        async for document in self._collection().find(query).sort([('created_at', 1), ('_id', 1)]):
+            created_at = document['created_at']
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            key = (document['_id'], created_at)
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            expires_at = document['expires_at']
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            self._remember_user(document['user_id'], document['revoked_before'], expires_at.timestamp())
+            count += 1
+        # Idle ticks still move the window forward, so each query stays one interval wide
+        self._last_sync = started
+        # Keep only keys the next overlapping query can return again
+        horizon = self._last_sync - timedelta(seconds=self.sync_interval)
+        self._seen = {key for key in self._seen if key[1] >= horizon}
+        return count
+
+    async def _sync_forever(self) -> None:
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                print(f'❌ Revocation sync failed: {e}')
+            await asyncio.sleep(self.sync_interval)
+
+    def start(self) -> None:
+        if self._syncer is None:
+            self._syncer = asyncio.create_task(self._sync_forever())
+
+    async def stop(self) -> None:
+        if self._syncer is not None:
+            self._syncer.cancel()
+            try:
+                await self._syncer
+            except asyncio.CancelledError:
+                pass
+            self._syncer = None
+
+    def stats(self) -> dict:
+        return {
+            'revoked_users': len(self._revoked_before),
+            'reuse_detected': self.reuse_detected,
+            'last_sync': self._last_sync.isoformat() if self._last_sync else None,
+        }
+
+
+revocation_store = RevocationStore(
+    sync_interval=settings.REVOCATION_SYNC_SECONDS,
+    refresh_lifetime=settings.JWT_REFRESH_TOKEN_EXPIRES_SECONDS,
+)
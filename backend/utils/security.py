@@ -1,16 +1,116 @@
-from authx import AuthX
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from authx import AuthX, TokenPayload
+from authx.exceptions import RevokedTokenError
+from fastapi import Request
 from passlib.context import CryptContext
 from datetime import datetime, timezone, timedelta
 from jose import jwt
 from utils.config import settings
+from utils.exceptions import HasherSaturatedError
+from utils.metrics import timed
+from utils.revocation import ISSUED_AT_CLAIM, revocation_store
 
 # Configure AuthX with JWT settings
 authx_security = AuthX()
 authx_security.config.JWT_SECRET_KEY = settings.JWT_SECRET_KEY
+authx_security.config.JWT_REFRESH_TOKEN_EXPIRES = timedelta(seconds=settings.JWT_REFRESH_TOKEN_EXPIRES_SECONDS)
+
+DEFAULT_BCRYPT_ROUNDS = 12
+MAX_BCRYPT_ROUNDS = 31
 
 pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+bcrypt_rounds = DEFAULT_BCRYPT_ROUNDS
+
+
+def configure_hashing(rounds: int) -> None:
+    '''Hash new passwords with ``rounds``; also the process-pool initializer'''
+    global pwd_context, bcrypt_rounds
+    pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__rounds=rounds)
+    bcrypt_rounds = rounds
+
+
+def parse_bcrypt_hash(hashed: str) -> tuple[str, int] | None:
+    '''Return (ident, rounds) of a bcrypt hash such as "$2b$12$..."'''
+    parts = hashed.split('$') if hashed else []
+    if len(parts) != 4 or not parts[2].isdigit():
+        return None
+    return parts[1], int(parts[2])
+
+
+def needs_rehash(hashed: str) -> bool:
+    '''
+    True for hashes weaker than the current cost or using an old ident.
+
+    Stronger hashes are left alone, so lowering the cost never downgrades
+    existing passwords.
+    '''
+    parsed = parse_bcrypt_hash(hashed)
+    if parsed is None:
+        return pwd_context.needs_update(hashed)
+    ident, rounds = parsed
+    return ident != '2b' or rounds < bcrypt_rounds
+
+
+def measure_bcrypt(rounds: int, samples: int = 3) -> float:
+    '''Fastest of ``samples`` hashes at ``rounds``, in seconds'''
+    hasher = CryptContext(schemes=['bcrypt'], bcrypt__rounds=rounds)
+    best = float('inf')
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.hash('calibration-password')
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def calibrate_bcrypt_rounds(budget_ms: float, min_rounds: int) -> int:
+    '''
+    Largest bcrypt cost whose hash fits ``budget_ms`` on this host.
+
+    Each extra round doubles the work, so one measurement at the floor is
+    extrapolated and the pick is confirmed with a single hash at that cost.
+    '''
+    base = measure_bcrypt(min_rounds)
+    rounds = min_rounds
+    while rounds < MAX_BCRYPT_ROUNDS and base * 2 ** (rounds + 1 - min_rounds) * 1000 <= budget_ms:
+        rounds += 1
+    while rounds > min_rounds and measure_bcrypt(rounds, samples=1) * 1000 > budget_ms:
+        rounds -= 1
+    return rounds
+
 
+async def configure_password_hashing() -> int:
+    '''Apply HASH_ROUNDS or calibrate to HASH_TIME_BUDGET_MS at startup'''
+    if settings.HASH_ROUNDS is not None:
+        rounds = settings.HASH_ROUNDS
+    elif settings.HASH_TIME_BUDGET_MS is not None:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        rounds = await loop.run_in_executor(
+            None, calibrate_bcrypt_rounds, settings.HASH_TIME_BUDGET_MS, settings.HASH_MIN_ROUNDS
+        )
+        print(
+            f'✅ bcrypt cost calibrated to {rounds} for a {settings.HASH_TIME_BUDGET_MS:.0f} ms budget '
+            f'({(time.perf_counter() - started) * 1000:.0f} ms)'
+        )
+    else:
+        return bcrypt_rounds
+    # Process workers forked earlier would still hash with the old cost
+    password_hasher.shutdown()
+    configure_hashing(rounds)
+    return rounds
 
+
+def _warm_backend() -> str:
+    return pwd_context.hash('warm-up')
+
+
+# Untimed: these run in the pool, where a process worker's metrics would
+# never reach /metrics; PasswordHasher times them from the event loop
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
@@ -19,6 +119,234 @@ def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 
+class PasswordHasher:
+    '''
+    Runs bcrypt hashing and verification on a bounded worker pool.
+
+    Calls beyond ``workers + queue_size`` in flight are rejected with
+    HasherSaturatedError instead of piling up behind the pool.
+    '''
+
+    def __init__(self, executor: str, workers: int, queue_size: int):
+        self.executor_kind = executor
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue_size)
+        self._executor: Executor | None = None
+        self._in_flight = 0
+        self._rejected = 0
+        self._completed = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+        self._last_seconds = 0.0
+        self._rehashes: set[asyncio.Task] = set()
+        self.rehashed = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == 'process':
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=configure_hashing, initargs=(bcrypt_rounds,)
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix='pwd-hash'
+                )
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self._in_flight >= self.capacity:
+            self._rejected += 1
+            raise HasherSaturatedError(settings.HASH_RETRY_AFTER)
+
+        self._in_flight += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._in_flight -= 1
+            self._completed += 1
+            self._total_seconds += elapsed
+            self._last_seconds = elapsed
+            if elapsed > self._max_seconds:
+                self._max_seconds = elapsed
+
+    # Timed in this process, queue wait included, for either executor
+    @timed('password', 'hash_password')
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    @timed('password', 'verify_password')
+    async def verify(self, plain: str, hashed: str) -> bool:
+        return await self._run(verify_password, plain, hashed)
+
+    def rehash_in_background(self, plain: str, hashed: str, store) -> None:
+        '''
+        Upgrade a hash after a successful verify without delaying the
+        response. ``store(new_hash)`` persists it; skipped under load.
+        '''
+        if self._in_flight >= self.workers:
+            return
+
+        async def rehash():
+            try:
+                new_hash = await self.hash(plain)
+                if await store(new_hash):
+                    self.rehashed += 1
+            except Exception as e:
+                print(f'❌ Password rehash failed: {e}')
+
+        task = asyncio.create_task(rehash())
+        self._rehashes.add(task)
+        task.add_done_callback(self._rehashes.discard)
+
+    async def warm_up(self) -> None:
+        '''Start every pool worker and load the bcrypt backend in each before serving'''
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*(loop.run_in_executor(executor, _warm_backend) for _ in range(self.workers)))
+
+    def stats(self) -> dict:
+        '''Queue depth and per-hash latency for sizing workers per core'''
+        avg = self._total_seconds / self._completed if self._completed else 0.0
+        return {
+            'executor': self.executor_kind,
+            'bcrypt_rounds': bcrypt_rounds,
+            'workers': self.workers,
+            'capacity': self.capacity,
+            'in_flight': self._in_flight,
+            'queue_depth': max(0, self._in_flight - self.workers),
+            'completed': self._completed,
+            'rejected': self._rejected,
+            'avg_ms': round(avg * 1000, 2),
+            'last_ms': round(self._last_seconds * 1000, 2),
+            'max_ms': round(self._max_seconds * 1000, 2),
+            'rehashed': self.rehashed,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    executor=settings.HASH_EXECUTOR,
+    workers=settings.HASH_WORKERS,
+    queue_size=settings.HASH_QUEUE_SIZE,
+)
+
+
+async def hash_password_async(password: str) -> str:
+    return await password_hasher.hash(password)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await password_hasher.verify(plain, hashed)
+
+
+class VerifiedTokenCache:
+    '''
+    LRU of verified access-token payloads keyed by a SHA-256 digest of the
+    token. Entries are never served past the token's own ``exp``.
+    '''
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._entries: OrderedDict[bytes, tuple[float, TokenPayload]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: bytes, now: float) -> TokenPayload | None:
+        entry = self._entries.get(digest)
+        if entry is None or entry[0] <= now:
+            if entry is not None:
+                del self._entries[digest]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, digest: bytes, expires_at: float, payload: TokenPayload) -> None:
+        self._entries[digest] = (expires_at, payload)
+        self._entries.move_to_end(digest)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, token: str) -> None:
+        self._entries.pop(hashlib.sha256(token.encode()).digest(), None)
+
+    def stats(self) -> dict:
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+def _expiry_timestamp(payload: TokenPayload) -> float | None:
+    exp = payload.exp
+    if isinstance(exp, datetime):
+        return exp.timestamp()
+    if isinstance(exp, (int, float)):
+        return float(exp)
+    return None
+
+
+verified_token_cache = VerifiedTokenCache(settings.JWT_CACHE_MAX_ENTRIES)
+
+
+async def access_token_required(request: Request) -> TokenPayload:
+    '''
+    Drop-in for ``authx_security.access_token_required``.
+
+    With JWT_CACHE_ENABLED, header tokens that already verified are served
+    from verified_token_cache; the blocklist and in-memory revocation
+    checks still run every time.
+    '''
+    request_token = await authx_security.get_access_token_from_request(request)
+    if authx_security.is_token_in_blocklist(request_token.token):
+        raise RevokedTokenError('Token has been revoked')
+
+    # Cookie tokens need per-request CSRF checks, so only headers are cached
+    cacheable = settings.JWT_CACHE_ENABLED and request_token.location == 'headers'
+    if cacheable:
+        digest = hashlib.sha256(request_token.token.encode()).digest()
+        payload = verified_token_cache.get(digest, time.time())
+        if payload is not None:
+            if revocation_store.is_revoked(payload):
+                raise RevokedTokenError('Token has been revoked')
+            return payload
+
+    verify_csrf = authx_security.config.JWT_COOKIE_CSRF_PROTECT and (
+        request.method.upper() in authx_security.config.JWT_CSRF_METHODS
+    )
+    payload = authx_security.verify_token(
+        request_token, verify_type=True, verify_fresh=False, verify_csrf=verify_csrf
+    )
+    if revocation_store.is_revoked(payload):
+        raise RevokedTokenError('Token has been revoked')
+
+    if cacheable:
+        expires_at = _expiry_timestamp(payload)
+        if expires_at is not None:
+            verified_token_cache.put(digest, expires_at, payload)
+    return payload
+
+
+def create_token_pair(user_id: str) -> tuple[str, str]:
+    '''
+    Access and refresh token for a new session.
+
+    authx writes iat in whole seconds; both tokens also carry the exact
+    issue time, so a revocation only cuts off tokens issued before it and
+    a login right after a revocation gets working tokens.
+    '''
+    claims = {ISSUED_AT_CLAIM: time.time()}
+    return (
+        authx_security.create_access_token(user_id, data=claims),
+        authx_security.create_refresh_token(user_id, data=claims),
+    )
+
+
 def create_confirmation_token(username: str) -> str:
     secret = authx_security.config.JWT_SECRET_KEY
     exp = datetime.now(timezone.utc) + timedelta(minutes=30)
@@ -0,0 +1,190 @@
+'''
+In-process pub/sub of task status changes for long-poll and SSE waiters.
+
+update_task_status publishes changes made in this process. Changes made
+by other processes (the email worker) arrive through a change stream
+when TASK_EVENTS_CHANGE_STREAM is on, otherwise through one shared poll
+of every watched task per interval, so database load does not grow with
+the number of waiters. If the change stream fails, the hub polls while
+it retries the stream with exponential backoff.
+'''
+
+import asyncio
+from datetime import datetime, timezone
+
+from utils import db as mongo
+from utils.config import settings
+
+
+# Task fields clients may see; email_data holds tokens and stays private
+PUBLIC_TASK_FIELDS = (
+    'task_type', 'status', 'current_step', 'progress', 'error',
+    'retry_count', 'created_at', 'updated_at',
+)
+
+# Backoff between change stream attempts; the hub polls in the meantime
+STREAM_RETRY_MIN_SECONDS = 1.0
+STREAM_RETRY_MAX_SECONDS = 60.0
+
+
+def public_task_fields(fields: dict) -> dict:
+    return {name: fields[name] for name in PUBLIC_TASK_FIELDS if name in fields}
+
+
+def as_utc(moment: datetime | None) -> datetime | None:
+    '''Mongo hands back naive UTC datetimes; compare them as aware ones'''
+    if moment is not None and moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+class TooManyWaiters(Exception):
+    pass
+
+
+class TaskWaiter:
+    '''Latest-wins mailbox: a slow consumer only ever sees the newest state'''
+
+    __slots__ = ('snapshot', 'changed')
+
+    def __init__(self):
+        self.snapshot: dict | None = None
+        self.changed = asyncio.Event()
+
+    async def wait(self, timeout: float) -> dict | None:
+        '''Return the next snapshot, or None if nothing changed in time'''
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.changed.clear()
+        return self.snapshot
+
+
+class TaskEventHub:
+    def __init__(self, max_waiters: int, poll_interval: float):
+        self.max_waiters = max_waiters
+        self.poll_interval = poll_interval
+        self._waiters: dict[str, set[TaskWaiter]] = {}
+        self._snapshots: dict[str, dict] = {}
+        self._waiter_count = 0
+        self._runner: asyncio.Task | None = None
+        self.published = 0
+        self.polls = 0
+        self.stream_failures = 0
+
+    def subscribe(self, task_id: str) -> TaskWaiter:
+        '''Register a waiter; subscribe before reading the task so no update is missed'''
+        if self._waiter_count >= self.max_waiters:
+            raise TooManyWaiters()
+        waiter = TaskWaiter()
+        self._waiters.setdefault(task_id, set()).add(waiter)
+        self._waiter_count += 1
+        return waiter
+
+    def unsubscribe(self, task_id: str, waiter: TaskWaiter) -> None:
+        waiters = self._waiters.get(task_id)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.discard(waiter)
+        self._waiter_count -= 1
+        if not waiters:
+            del self._waiters[task_id]
+            self._snapshots.pop(task_id, None)
+
+    def seed(self, task_id: str, document: dict) -> dict:
+        '''Record the state a waiter read after subscribing; newer updates win'''
+        snapshot = {**public_task_fields(document), **self._snapshots.get(task_id, {})}
+        if task_id in self._waiters:
+            self._snapshots[task_id] = snapshot
+        return snapshot
+
+    def publish(self, task_id: str, fields: dict) -> None:
+        waiters = self._waiters.get(task_id)
+        if not waiters:
+            return
+        changes = public_task_fields(fields)
+        if not changes:
+            return
+        snapshot = {**self._snapshots.get(task_id, {}), **changes}
+        self._snapshots[task_id] = snapshot
+        self.published += 1
+        for waiter in waiters:
+            waiter.snapshot = snapshot
+            waiter.changed.set()
+
+    async def _poll_once(self) -> None:
+        '''One read of every watched task, publishing the ones that changed'''
+        if not self._waiters:
+            return
+        collection = mongo.get_database()['processing_tasks']
+        projection = {name: 1 for name in PUBLIC_TASK_FIELDS}
+        try:
+            self.polls += 1
+            async for document in collection.find({'_id': {'$in': list(self._waiters)}}, projection):
+                known = self._snapshots.get(document['_id'], {})
+                if as_utc(document.get('updated_at')) != as_utc(known.get('updated_at')):
+                    self.publish(document['_id'], document)
+        except Exception as e:
+            print(f'❌ Task status poll failed: {e}')
+
+    async def _poll_forever(self, duration: float | None = None) -> None:
+        '''Poll every interval, for ``duration`` seconds or forever'''
+        loop = asyncio.get_running_loop()
+        deadline = None if duration is None else loop.time() + duration
+        while deadline is None or loop.time() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            await self._poll_once()
+
+    async def _watch_forever(self) -> None:
+        collection = mongo.get_database()['processing_tasks']
+        pipeline = [{'$match': {'operationType': 'update'}}]
+        backoff = STREAM_RETRY_MIN_SECONDS
+        while True:
+            try:
+                async with collection.watch(pipeline) as stream:
+                    backoff = STREAM_RETRY_MIN_SECONDS
+                    # Catch up on changes made while the stream was down
+                    await self._poll_once()
+                    async for change in stream:
+                        task_id = change['documentKey']['_id']
+                        if task_id in self._waiters:
+                            self.publish(task_id, change['updateDescription']['updatedFields'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Failover, network error, or no replica set at all: poll, then retry
+                self.stream_failures += 1
+                print(f'❌ Task change stream failed, polling for {backoff:.0f}s before retrying: {e}')
+                await self._poll_forever(backoff)
+                backoff = min(backoff * 2, STREAM_RETRY_MAX_SECONDS)
+
+    def start(self, change_stream: bool) -> None:
+        if self._runner is None:
+            self._runner = asyncio.create_task(
+                self._watch_forever() if change_stream else self._poll_forever()
+            )
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    def stats(self) -> dict:
+        return {
+            'waiters': self._waiter_count,
+            'watched_tasks': len(self._waiters),
+            'published': self.published,
+            'polls': self.polls,
+            'stream_failures': self.stream_failures,
+        }
+
+
+task_event_hub = TaskEventHub(
+    max_waiters=settings.TASK_MAX_WAITERS,
+    poll_interval=settings.TASK_EVENTS_POLL_INTERVAL,
+)
@@ -2,25 +2,187 @@
 Task management functions for background job processing.
 '''
 
+import asyncio
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 from typing import Optional, Dict, Any
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from utils import db as mongo
 from utils.config import settings
+from utils.metrics import timed, task_status_updates
+from utils.task_events import task_event_hub
+
+TERMINAL_STATUSES = ('completed', 'failed')
+TASK_STATUSES = ('pending', 'processing') + TERMINAL_STATUSES
 
 def get_database():
-    '''Get database connection'''
-    client = AsyncIOMotorClient(settings.MONGODB_URL)
-    return client[settings.DATABASE_NAME]
+    '''Get the shared, lifespan-managed database'''
+    return mongo.get_database()
 
 
-async def create_task_record(
+class TaskStatusWriter:
+    '''
+    Write-behind buffer for task status transitions.
+    
+    Transitions for the same task are coalesced into one $set and flushed
+    with an unordered bulk_write every ``flush_interval`` seconds or once
+    ``max_batch`` tasks are buffered. With ``sync_terminal`` enabled,
+    completed/failed transitions are written immediately together with any
+    buffered fields for that task. Transitions are published to
+    task_event_hub only after Mongo applied them.
+    '''
+
+    def __init__(self, flush_interval: float, max_batch: int, sync_terminal: bool):
+        self.flush_interval = flush_interval
+        self.max_batch = max(1, max_batch)
+        self.sync_terminal = sync_terminal
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        # task_id -> worker whose lease must still hold when the write lands
+        self._owners: Dict[str, str] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self.flushes = 0
+        self.coalesced = 0
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _ensure_started(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_forever())
+
+    async def _flush_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f'❌ Task status flush failed: {e}')
+
+    def _filter(self, task_id: str, worker_id: Optional[str]) -> Dict[str, Any]:
+        if worker_id is None:
+            return {'_id': task_id}
+        return {'_id': task_id, 'locked_by': worker_id}
+
+    async def submit(self, task_id: str, fields: Dict[str, Any], worker_id: Optional[str] = None) -> bool:
+        '''Buffer fields for a task, writing terminal states synchronously'''
+        self._ensure_started()
+        if worker_id is not None:
+            self._owners[task_id] = worker_id
+        if task_id in self._pending:
+            self.coalesced += 1
+            self._pending[task_id].update(fields)
+        else:
+            self._pending[task_id] = dict(fields)
+
+        if self.sync_terminal and fields.get('status') in TERMINAL_STATUSES:
+            return await self.write_now(task_id, {}, worker_id)
+        if len(self._pending) >= self.max_batch:
+            await self.flush()
+        return True
+
+    async def write_now(self, task_id: str, fields: Dict[str, Any], worker_id: Optional[str] = None) -> bool:
+        '''
+        Write buffered plus given fields for one task, bypassing the buffer.
+        
+        With ``worker_id`` the write only lands while that worker still
+        holds the task; False then means the lease was lost.
+        '''
+        # Serialised with flush() so an in-flight batch cannot land afterwards
+        async with self._get_lock():
+            update_data = self._pending.pop(task_id, {})
+            owner = self._owners.pop(task_id, None)
+            update_data.update(fields)
+            if not update_data:
+                return False
+            db = get_database()
+            result = await db['processing_tasks'].update_one(
+                self._filter(task_id, worker_id or owner),
+                {'$set': update_data}
+            )
+            if result.matched_count:
+                task_event_hub.publish(task_id, update_data)
+            return result.modified_count > 0
+
+    async def _publish_landed(self, batch: Dict[str, Dict[str, Any]], owners: Dict[str, str], matched: int) -> None:
+        '''Publish the flushed transitions that Mongo actually applied'''
+        landed = list(batch)
+        if matched < len(batch):
+            # Some lease-guarded writes matched nothing; one read tells which
+            cursor = get_database()['processing_tasks'].find({'_id': {'$in': landed}}, {'locked_by': 1})
+            current = {document['_id']: document.get('locked_by') async for document in cursor}
+            landed = [
+                task_id for task_id in landed
+                if task_id in current and (task_id not in owners or current[task_id] == owners[task_id])
+            ]
+        for task_id in landed:
+            task_event_hub.publish(task_id, batch[task_id])
+
+    async def flush(self) -> int:
+        '''Write every buffered transition in one bulk_write'''
+        async with self._get_lock():
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            owners, self._owners = self._owners, {}
+            operations = [
+                UpdateOne(self._filter(task_id, owners.get(task_id)), {'$set': fields})
+                for task_id, fields in batch.items()
+            ]
+            db = get_database()
+            try:
+                result = await db['processing_tasks'].bulk_write(operations, ordered=False)
+            except Exception:
+                # Put the batch back, keeping any newer fields buffered meanwhile
+                for task_id, fields in batch.items():
+                    self._pending[task_id] = {**fields, **self._pending.get(task_id, {})}
+                for task_id, owner in owners.items():
+                    self._owners.setdefault(task_id, owner)
+                raise
+            self.flushes += 1
+            # Under the lock, so a later write_now cannot publish before this
+            await self._publish_landed(batch, owners, result.matched_count)
+            return len(operations)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'buffered': len(self._pending),
+            'flushes': self.flushes,
+            'coalesced': self.coalesced,
+        }
+
+    async def close(self) -> None:
+        '''Stop the flush loop and write everything still buffered'''
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._pending:
+            await self.flush()
+
+
+task_status_writer = TaskStatusWriter(
+    flush_interval=settings.TASK_FLUSH_INTERVAL_MS / 1000,
+    max_batch=settings.TASK_FLUSH_MAX_BATCH,
+    sync_terminal=settings.TASK_SYNC_TERMINAL,
+)
+
+
+def build_task_document(
     user_id: str,
     task_type: str = 'email',
     email_data: Optional[Dict[str, Any]] = None
-) -> str:
+) -> Dict[str, Any]:
     '''
-    Create a new email task record in MongoDB.
+    Build a new pending task document without inserting it.
+    
+    The record doubles as the queue entry: a worker claims it once its
+    status is 'pending' and run_after has passed.
     
     Args:
         user_id: User ID who created the task
@@ -28,16 +190,19 @@ async def create_task_record(
         email_data: Email information for email tasks
         
     Returns:
-        Task ID
+        Task document with a fresh '_id'
     '''
-    task_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
     
     task_document = {
-        '_id': task_id,
+        '_id': str(uuid.uuid4()),
         'user_id': user_id,
         'status': 'pending',
-        'created_at': datetime.now(timezone.utc),
-        'updated_at': datetime.now(timezone.utc),
+        'created_at': now,
+        'updated_at': now,
+        'run_after': now,
+        'locked_until': None,
+        'locked_by': None,
         'task_type': task_type,
         'current_step': 'queued',
         'result': None,
@@ -50,11 +215,33 @@ async def create_task_record(
     if email_data:
         task_document['email_data'] = email_data
     
+    return task_document
+
+
+@timed('tasks')
+async def create_task_record(
+    user_id: str,
+    task_type: str = 'email',
+    email_data: Optional[Dict[str, Any]] = None
+) -> str:
+    '''
+    Create a new email task record in MongoDB.
+    
+    Args:
+        user_id: User ID who created the task
+        task_type: Type of task (default: 'email')
+        email_data: Email information for email tasks
+        
+    Returns:
+        Task ID
+    '''
+    task_document = build_task_document(user_id, task_type, email_data)
     db = get_database()
     await db['processing_tasks'].insert_one(task_document)
-    return task_id
+    return task_document['_id']
 
 
+@timed('tasks')
 async def update_task_status(
     task_id: str, 
     status: str, 
@@ -62,11 +249,15 @@ async def update_task_status(
     progress: int = None,
     result: Dict[str, Any] = None,
     error: str = None,
-    retry_count: int = None
+    retry_count: int = None,
+    worker_id: str = None
 ) -> bool:
     '''
     Update task status in MongoDB.
     
+    With TASK_WRITE_BEHIND enabled, non-terminal transitions are buffered
+    in task_status_writer and True means the update was accepted.
+    
     Args:
         task_id: Task ID to update
         status: New status (pending, processing, completed, failed)
@@ -75,6 +266,7 @@ async def update_task_status(
         result: Task result data (when completed)
         error: Error message (when failed)
         retry_count: Number of retry attempts
+        worker_id: Only write while this worker holds the task's lease
         
     Returns:
         True if update was successful
@@ -84,6 +276,10 @@ async def update_task_status(
         'updated_at': datetime.now(timezone.utc)
     }
     
+    # finished_at drives the TTL index that expires finished tasks
+    if status in TERMINAL_STATUSES:
+        update_data['finished_at'] = update_data['updated_at']
+    
     if current_step is not None:
         update_data['current_step'] = current_step
     if progress is not None:
@@ -95,15 +291,25 @@ async def update_task_status(
     if retry_count is not None:
         update_data['retry_count'] = retry_count
     
+    task_status_updates.labels(status).inc()
+    
+    # Waiters hear about the change only once it is in Mongo: here, or from
+    # task_status_writer when the buffered write lands
+    if settings.TASK_WRITE_BEHIND:
+        return await task_status_writer.submit(task_id, update_data, worker_id)
+    
     db = get_database()
     result = await db['processing_tasks'].update_one(
-        {'_id': task_id},
+        task_status_writer._filter(task_id, worker_id),
         {'$set': update_data}
     )
+    if result.matched_count:
+        task_event_hub.publish(task_id, update_data)
     
     return result.modified_count > 0
 
 
+@timed('tasks')
 async def get_task_by_id(task_id: str) -> Optional[Dict[str, Any]]:
     '''
     Get task by ID from MongoDB.
@@ -120,6 +326,7 @@ async def get_task_by_id(task_id: str) -> Optional[Dict[str, Any]]:
 
 
 
+@timed('tasks')
 async def increment_retry_count(task_id: str) -> bool:
     '''
     Increment retry count for a task.
@@ -139,6 +346,7 @@ async def increment_retry_count(task_id: str) -> bool:
     return result.modified_count > 0
 
 
+@timed('tasks')
 async def should_retry_task(task_id: str) -> bool:
     '''
     Check if a task should be retried based on retry count.
@@ -156,4 +364,126 @@ async def should_retry_task(task_id: str) -> bool:
     retry_count = task.get('retry_count', 0)
     max_retries = task.get('max_retries', 1)
     
-    return retry_count < max_retries
\ No newline at end of file
+    return retry_count < max_retries
+
+
+@timed('tasks')
+async def claim_next_task(
+    worker_id: str,
+    lease_seconds: int,
+    task_types: tuple[str, ...] = ('email',)
+) -> Optional[Dict[str, Any]]:
+    '''
+    Atomically claim the oldest runnable pending task.
+    
+    Args:
+        worker_id: Identifier of the claiming worker
+        lease_seconds: How long the claim is held before it can be recovered
+        task_types: Types of task the worker can run
+        
+    Returns:
+        Claimed task document or None if the queue is empty
+    '''
+    now = datetime.now(timezone.utc)
+    db = get_database()
+    return await db['processing_tasks'].find_one_and_update(
+        {'status': 'pending', 'task_type': {'$in': list(task_types)}, 'run_after': {'$lte': now}},
+        {'$set': {
+            'status': 'processing',
+            'locked_by': worker_id,
+            'locked_until': now + timedelta(seconds=lease_seconds),
+            'updated_at': now
+        }},
+        sort=[('run_after', 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+@timed('tasks')
+async def release_task_for_retry(
+    task_id: str, delay_seconds: int, error: str, retry_count: int, worker_id: str = None
+) -> bool:
+    '''
+    Return a claimed task to the queue so it is retried after a delay.
+    
+    Args:
+        task_id: Task ID to release
+        delay_seconds: Seconds to wait before the task becomes claimable
+        error: Error message from the failed attempt
+        retry_count: Number of attempts made so far
+        worker_id: Only release while this worker holds the task's lease
+        
+    Returns:
+        True if update was successful
+    '''
+    now = datetime.now(timezone.utc)
+    # Written through the status writer so buffered 'processing' fields for
+    # this task cannot land after the requeue
+    return await task_status_writer.write_now(task_id, {
+        'status': 'pending',
+        'current_step': f'Waiting to retry (attempt {retry_count + 1})',
+        'error': error,
+        'retry_count': retry_count,
+        'run_after': now + timedelta(seconds=delay_seconds),
+        'locked_by': None,
+        'locked_until': None,
+        'updated_at': now
+    }, worker_id)
+
+
+@timed('tasks')
+async def renew_task_lease(task_id: str, worker_id: str, lease_seconds: int) -> bool:
+    '''
+    Extend the lease of a long-running task.
+    
+    Returns:
+        False if the task is no longer held by this worker
+    '''
+    now = datetime.now(timezone.utc)
+    db = get_database()
+    result = await db['processing_tasks'].update_one(
+        {'_id': task_id, 'status': 'processing', 'locked_by': worker_id},
+        {'$set': {'locked_until': now + timedelta(seconds=lease_seconds), 'updated_at': now}}
+    )
+    return result.matched_count > 0
+
+
+@timed('tasks')
+async def recover_expired_leases() -> int:
+    '''
+    Requeue tasks whose worker lease expired, counting the lost run as an
+    attempt; tasks that used up max_retries are failed instead, so a task
+    that crashes its handler cannot loop forever.
+    
+    Returns:
+        Number of recovered (requeued or failed) tasks
+    '''
+    now = datetime.now(timezone.utc)
+    tasks = get_database()['processing_tasks']
+    expired = {'status': 'processing', 'locked_until': {'$lt': now}}
+    exhausted = {'$expr': {'$gte': [
+        {'$add': [{'$ifNull': ['$retry_count', 0]}, 1]},
+        {'$ifNull': ['$max_retries', 3]},
+    ]}}
+    released = {'locked_by': None, 'locked_until': None, 'updated_at': now}
+    
+    failed = await tasks.update_many(
+        {**expired, **exhausted},
+        {'$inc': {'retry_count': 1}, '$set': {
+            'status': 'failed',
+            'current_step': 'Failed after worker lease expired',
+            'error': 'Worker lease expired too many times',
+            'finished_at': now,
+            **released
+        }}
+    )
+    requeued = await tasks.update_many(
+        expired,
+        {'$inc': {'retry_count': 1}, '$set': {
+            'status': 'pending',
+            'current_step': 'Recovered after worker lease expired',
+            'run_after': now,
+            **released
+        }}
+    )
+    return failed.modified_count + requeued.modified_count
@@ -0,0 +1,166 @@
+'''
+Read-through cache of projected user records for hot lookups.
+'''
+
+import asyncio
+import time
+from collections import OrderedDict
+
+from utils.config import settings
+
+
+class UserCache:
+    '''
+    Bounded LRU of user records with a per-entry TTL.
+
+    Records are stored once and indexed by both id and username so either
+    key can be invalidated after a write.
+
+    Every invalidation bumps a generation counter and records it for the
+    key. A reader takes ``generation()`` before loading from Mongo and
+    passes it to ``put``, which skips the write if the key was invalidated
+    meanwhile, so a slow read cannot re-cache what a write just replaced.
+    '''
+
+    def __init__(self, enabled: bool, max_entries: int, ttl: float):
+        self.enabled = enabled
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._by_id: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._id_by_username: dict[str, str] = {}
+        # key (user id or username) -> generation of its last invalidation,
+        # bounded like the entries; puts older than _floor are always skipped
+        self._invalidated: OrderedDict[str, int] = OrderedDict()
+        self._generation = 0
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+        self._watcher: asyncio.Task | None = None
+
+    def _drop(self, user_id: str) -> None:
+        entry = self._by_id.pop(user_id, None)
+        if entry is not None:
+            self._id_by_username.pop(entry[1]['username'], None)
+
+    def get_by_id(self, user_id: str) -> dict | None:
+        if not self.enabled:
+            return None
+        entry = self._by_id.get(user_id)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                self._drop(user_id)
+            self.misses += 1
+            return None
+        self._by_id.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def get_by_username(self, username: str) -> dict | None:
+        user_id = self._id_by_username.get(username)
+        if user_id is None:
+            if self.enabled:
+                self.misses += 1
+            return None
+        return self.get_by_id(user_id)
+
+    def generation(self) -> int:
+        '''Take before reading a record that will be passed to put'''
+        return self._generation
+
+    def _bump(self, key: str) -> None:
+        self._generation += 1
+        self._invalidated[key] = self._generation
+        self._invalidated.move_to_end(key)
+        while len(self._invalidated) > self.max_entries:
+            _, generation = self._invalidated.popitem(last=False)
+            self._floor = max(self._floor, generation)
+
+    def _is_stale(self, record: dict, generation: int) -> bool:
+        if generation < self._floor:
+            return True
+        return any(
+            self._invalidated.get(key, 0) > generation
+            for key in (record['id'], record['username'])
+        )
+
+    def put(self, record: dict, generation: int | None = None) -> None:
+        '''Cache a record read at ``generation``, unless invalidated since'''
+        if not self.enabled:
+            return
+        if generation is not None and self._is_stale(record, generation):
+            self.stale_puts += 1
+            return
+        user_id = record['id']
+        self._drop(user_id)
+        self._by_id[user_id] = (time.monotonic() + self.ttl, record)
+        self._id_by_username[record['username']] = user_id
+        while len(self._by_id) > self.max_entries:
+            oldest_id, _ = next(iter(self._by_id.items()))
+            self._drop(oldest_id)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str | None = None, username: str | None = None) -> None:
+        if not self.enabled:
+            return
+        for key in (user_id, username):
+            if key is not None:
+                self._bump(key)
+        if user_id is None and username is not None:
+            user_id = self._id_by_username.get(username)
+        if user_id is not None and user_id in self._by_id:
+            self._drop(user_id)
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._by_id),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'stale_puts': self.stale_puts,
+            'change_stream': self._watcher is not None and not self._watcher.done(),
+        }
+
+    async def _watch(self, collection) -> None:
+        pipeline = [{'$match': {'operationType': {'$in': ['update', 'replace', 'delete']}}}]
+        while True:
+            try:
+                async with collection.watch(pipeline) as stream:
+                    async for change in stream:
+                        self.invalidate(user_id=str(change['documentKey']['_id']))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f'❌ User cache change stream failed: {e}')
+                # Entries written meanwhile may be stale, and so may reads in flight
+                self._by_id.clear()
+                self._id_by_username.clear()
+                self._generation += 1
+                self._floor = self._generation
+                await asyncio.sleep(5)
+
+    def start_change_stream(self, collection) -> None:
+        '''Keep caches in several workers coherent (needs a replica set)'''
+        if self.enabled and self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch(collection))
+
+    async def stop_change_stream(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+
+user_cache = UserCache(
+    enabled=settings.USER_CACHE_ENABLED,
+    max_entries=settings.USER_CACHE_MAX_ENTRIES,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,11 @@
+'''
+Entry point for the email worker: ``python -m workers`` from backend/.
+'''
+
+import asyncio
+
+from workers.runner import main
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+'''
+Background purge of a deleted account and every document it owns.
+'''
+
+import asyncio
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from utils import db as mongo
+from utils.config import settings
+from utils.tasks import update_task_status, renew_task_lease
+
+
+class LeaseLost(Exception):
+    '''Another worker recovered this task; stop without touching its status'''
+
+
+async def _delete_in_batches(collection, query: dict, on_batch) -> int:
+    '''
+    Delete matching documents ``PURGE_BATCH_SIZE`` at a time.
+
+    Each round trip only touches one batch of _ids, so a large purge never
+    holds a long-running delete, and the job can stop and resume anywhere.
+    '''
+    deleted = 0
+    while True:
+        ids = [
+            document['_id']
+            async for document in collection.find(query, {'_id': 1}).limit(settings.PURGE_BATCH_SIZE)
+        ]
+        if not ids:
+            return deleted
+        result = await collection.delete_many({'_id': {'$in': ids}})
+        deleted += result.deleted_count
+        if not await on_batch(deleted):
+            raise LeaseLost(collection.name)
+        await asyncio.sleep(settings.PURGE_BATCH_DELAY_MS / 1000)
+
+
+async def process_account_purge(task: dict):
+    '''
+    Remove a user marked deleted together with its processing tasks.
+
+    The user document goes last: until then it carries the username
+    needed to find registration and reset tasks. Every step only deletes
+    what is left, so a crashed run is simply claimed again after its lease
+    expires and continues where it stopped.
+
+    Args:
+        task: Claimed 'account_purge' task; user_id is the account's _id
+    '''
+    task_id = task['_id']
+    worker_id = task['locked_by']
+    user_id = task['user_id']
+    database = mongo.get_database()
+
+    user = await database['users'].find_one({'_id': ObjectId(user_id)}, {'username': 1, 'deleted_at': 1})
+    if user is not None and user.get('deleted_at') is None:
+        await update_task_status(
+            task_id=task_id,
+            worker_id=worker_id,
+            status='failed',
+            current_step='Account is not marked for deletion',
+            error='Refusing to purge an active account'
+        )
+        return
+
+    # Tasks are keyed by username at registration and by _id later
+    owners = [user_id]
+    if user is not None:
+        owners.append(user['username'])
+    tasks_query = {'user_id': {'$in': owners}, '_id': {'$ne': task_id}}
+    total = await database['processing_tasks'].count_documents(tasks_query)
+
+    await update_task_status(
+        task_id=task_id,
+        worker_id=worker_id,
+        status='processing',
+        current_step=f'Deleting {total} processing task(s)',
+        progress=0
+    )
+
+    async def report(deleted: int) -> bool:
+        await update_task_status(
+            task_id=task_id,
+            worker_id=worker_id,
+            status='processing',
+            current_step=f'Deleted {deleted}/{total} processing task(s)',
+            progress=min(99, deleted * 100 // max(total, 1))
+        )
+        return await renew_task_lease(task_id, worker_id, settings.WORKER_LEASE_SECONDS)
+
+    try:
+        deleted_tasks = await _delete_in_batches(database['processing_tasks'], tasks_query, report)
+    except LeaseLost:
+        print(f'⚠️  Account purge {task_id} lost its lease; leaving it to the new owner')
+        return
+
+    # Refresh-token revocations stay until they expire on their own
+    deleted_users = 0
+    if user is not None:
+        result = await database['users'].delete_one({'_id': user['_id'], 'deleted_at': {'$ne': None}})
+        deleted_users = result.deleted_count
+
+    await update_task_status(
+        task_id=task_id,
+        worker_id=worker_id,
+        status='completed',
+        current_step='Account purged',
+        progress=100,
+        result={
+            'deleted_users': deleted_users,
+            'deleted_processing_tasks': deleted_tasks,
+            'purged_at': datetime.now(timezone.utc)
+        }
+    )
@@ -0,0 +1,120 @@
+'''
+Standalone queue worker that claims email and account purge tasks from
+MongoDB with leases.
+'''
+
+import asyncio
+import os
+import signal
+import socket
+
+from utils.config import settings
+from utils.db import connect_to_mongo, close_mongo_connection
+from utils.mail import smtp_pool, preload_email_templates
+from utils.tasks import claim_next_task, recover_expired_leases, task_status_writer
+from workers.account_purge import process_account_purge
+from workers.email_processor import process_email_task
+
+
+# Task type -> coroutine that runs one claimed task
+TASK_HANDLERS = {
+    'email': process_email_task,
+    'account_purge': process_account_purge,
+}
+
+
+class EmailWorker:
+    '''
+    Claims pending tasks and runs up to ``concurrency`` of them at once.
+
+    Each claim holds a lease of ``lease_seconds``; tasks whose lease expires
+    (for example because a worker crashed) are put back in the queue.
+    '''
+
+    def __init__(self, concurrency: int, lease_seconds: int, poll_interval: float):
+        self.concurrency = max(1, concurrency)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._running: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def _run_task(self, task: dict) -> None:
+        try:
+            await TASK_HANDLERS[task['task_type']](task)
+        except Exception as e:
+            # Leave the task processing; its lease expiry will requeue it
+            print(f'❌ {task["task_type"]} task {task["_id"]} crashed: {e}')
+        finally:
+            self._slots.release()
+
+    async def _recover_leases_forever(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                recovered = await recover_expired_leases()
+                if recovered:
+                    print(f'♻️  Recovered {recovered} task(s) with expired leases')
+            except Exception as e:
+                print(f'❌ Lease recovery failed: {e}')
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.lease_seconds / 2)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self) -> None:
+        print(f'✅ Email worker {self.worker_id} started (concurrency={self.concurrency})')
+        recovery = asyncio.create_task(self._recover_leases_forever())
+
+        while not self._stopping.is_set():
+            await self._slots.acquire()
+            try:
+                task = await claim_next_task(self.worker_id, self.lease_seconds, tuple(TASK_HANDLERS))
+            except Exception as e:
+                print(f'❌ Failed to claim task: {e}')
+                task = None
+
+            if task is None:
+                self._slots.release()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            running = asyncio.create_task(self._run_task(task))
+            self._running.add(running)
+            running.add_done_callback(self._running.discard)
+
+        recovery.cancel()
+        try:
+            await recovery
+        except asyncio.CancelledError:
+            pass
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        print(f'✅ Email worker {self.worker_id} stopped')
+
+
+async def main() -> None:
+    await connect_to_mongo()
+    preload_email_templates()
+    worker = EmailWorker(
+        concurrency=settings.WORKER_CONCURRENCY,
+        lease_seconds=settings.WORKER_LEASE_SECONDS,
+        poll_interval=settings.WORKER_POLL_INTERVAL,
+    )
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        await task_status_writer.close()
+        await smtp_pool.close()
+        await close_mongo_connection()
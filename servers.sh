@@ -46,6 +46,8 @@ source venv/bin/activate
 pip install -q -r requirements.txt
 uvicorn main:app --host 0.0.0.0 --port 8000 --reload &
 BACKEND_PID=$!
+python -m workers &
+WORKER_PID=$!
 popd >/dev/null
 
 # Wait a bit for backend to start
@@ -65,6 +67,7 @@ if command -v npm >/dev/null 2>&1; then
 else
   echo -e "${RED}npm is not installed. Please install Node.js 20+.${NC}"
   kill "$BACKEND_PID" 2>/dev/null || true
+  kill "$WORKER_PID" 2>/dev/null || true
   exit 1
 fi
 
@@ -72,6 +75,7 @@ popd >/dev/null
 
 echo -e "${GREEN}Both servers are starting...${NC}"
 echo -e "${YELLOW}Backend PID: $BACKEND_PID${NC}"
+echo -e "${YELLOW}Email worker PID: $WORKER_PID${NC}"
 echo -e "${YELLOW}Frontend PID: $FRONTEND_PID${NC}"
 echo ""
 echo -e "${GREEN}Access the application at:${NC}"
@@ -85,6 +89,7 @@ echo -e "${YELLOW}Press Ctrl+C to stop both servers${NC}"
 cleanup() {
   echo -e "\n${YELLOW}Stopping servers...${NC}"
   kill "$BACKEND_PID" 2>/dev/null || true
+  kill "$WORKER_PID" 2>/dev/null || true
   kill "$FRONTEND_PID" 2>/dev/null || true
   lsof -ti:8000 | xargs kill -9 2>/dev/null || true
   lsof -ti:3000 | xargs kill -9 2>/dev/null || true